@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+LANLord benchmark suite
+
+Builds a disposable LAN inside network namespaces on one Linux box and
+times each LANLord v0.9 stage against it, so a change can be measured
+before and after. Needs root and iproute2; scapy and pysnmp are only
+needed for the ARP and SNMP stages, which are skipped without them.
+
+Layout:
+  llb-core   bridge llb-br0
+  llb-scan   scanner, veth llb-s (10.213.255.254/16), its own /etc/hosts for PTR lookups
+  llb-lan    every lab host as an address on veth llb-l, TCP listeners and SNMP stand-ins
+
+Hosts, open ports and SNMP responders are picked from a seeded RNG, so the
+same arguments always build the same network.
+
+Usage:
+  LANLord-bench.py run --hosts 500 --open 3 --snmp 50 --label before
+  LANLord-bench.py run --hosts 500 --delay 2 --label wan-ish       add 2 ms latency with netem
+  LANLord-bench.py compare before after                           stage rates side by side
+  LANLord-bench.py teardown                                       remove a lab left by --keep
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import socket
+import argparse
+import selectors
+import subprocess
+import importlib.util
+from datetime import datetime
+
+LANLORD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'LANLord-v0.9.py')
+RESULTS = 'LANLord_bench.jsonl'
+NS_CORE, NS_SCAN, NS_LAN = 'llb-core', 'llb-scan', 'llb-lan'
+LAB_NET = '10.213.0.0/16'
+SCANNER_IP = '10.213.255.254'
+STAGES = ('arp', 'icmp', 'tcp', 'snmp', 'dns')
+HOSTS_PER_SUBNET = 200
+# 10.213.0.0/24 up to 10.213.254.0/24; the scanner sits in .255
+MAX_HOSTS = 255 * HOSTS_PER_SUBNET
+
+# --- Lab Plan ---
+def lab_plan(hosts, ports, open_per_host, snmp, seed):
+    """
+    Which addresses exist, what each one listens on and which answer SNMP.
+    Hosts are spread over as many /24s as needed, HOSTS_PER_SUBNET per /24,
+    leaving the rest of each /24 dead so sweeps also pay for silence.
+    Raises ValueError past MAX_HOSTS.
+    """
+    if not 0 < hosts <= MAX_HOSTS:
+        raise ValueError(f"--hosts must be 1-{MAX_HOSTS}, the lab has {MAX_HOSTS // HOSTS_PER_SUBNET} /24s")
+    rng = random.Random(seed)
+    plan = {'seed': seed, 'hosts': {}, 'ports': ports}
+    for i in range(hosts):
+        ip = f"10.213.{i // HOSTS_PER_SUBNET}.{i % HOSTS_PER_SUBNET + 10}"
+        plan['hosts'][ip] = {
+            'ports': sorted(rng.sample(ports, min(open_per_host, len(ports)))),
+            'snmp': False,
+            'name': f"host{i}.bench.lan" if rng.random() < 0.7 else None,
+        }
+    for ip in rng.sample(sorted(plan['hosts']), min(snmp, hosts)):
+        plan['hosts'][ip]['snmp'] = True
+    plan['subnets'] = sorted({ip.rsplit('.', 1)[0] + '.0/24' for ip in plan['hosts']},
+                             key=lambda s: tuple(map(int, s.split('/')[0].split('.'))))
+    return plan
+
+# --- Namespace Setup ---
+def sh(*cmd, check=True, **kwargs):
+    return subprocess.run(cmd, check=check, **kwargs)
+
+def ns(name, *cmd, **kwargs):
+    return sh('ip', 'netns', 'exec', name, *cmd, **kwargs)
+
+def teardown():
+    for name in (NS_SCAN, NS_LAN, NS_CORE):
+        # a lab left by --keep still has its listeners running
+        pids = sh('ip', 'netns', 'pids', name, check=False, stdout=subprocess.PIPE,
+                  stderr=subprocess.DEVNULL, text=True).stdout.split()
+        for pid in pids:
+            try:
+                os.kill(int(pid), signal.SIGTERM)
+            except (OSError, ValueError):
+                pass
+        sh('ip', 'netns', 'del', name, check=False, stderr=subprocess.DEVNULL)
+    hosts_dir = f"/etc/netns/{NS_SCAN}"
+    if os.path.isdir(hosts_dir):
+        for f in os.listdir(hosts_dir):
+            os.remove(os.path.join(hosts_dir, f))
+        os.rmdir(hosts_dir)
+
+def build_lab(plan, delay_ms=0):
+    teardown()
+    for name in (NS_CORE, NS_SCAN, NS_LAN):
+        sh('ip', 'netns', 'add', name)
+    ns(NS_CORE, 'ip', 'link', 'add', 'llb-br0', 'type', 'bridge')
+    ns(NS_CORE, 'ip', 'link', 'set', 'llb-br0', 'up')
+    for name, dev, peer in ((NS_SCAN, 'llb-s', 'llb-bs'), (NS_LAN, 'llb-l', 'llb-bl')):
+        ns(NS_CORE, 'ip', 'link', 'add', peer, 'type', 'veth', 'peer', 'name', dev)
+        ns(NS_CORE, 'ip', 'link', 'set', dev, 'netns', name)
+        ns(NS_CORE, 'ip', 'link', 'set', peer, 'master', 'llb-br0', 'up')
+        ns(name, 'ip', 'link', 'set', 'lo', 'up')
+        ns(name, 'ip', 'link', 'set', dev, 'up')
+    ns(NS_SCAN, 'ip', 'addr', 'add', f"{SCANNER_IP}/16", 'dev', 'llb-s')
+    # thousands of addresses go in through one ip -batch call
+    batch = ''.join(f"addr add {ip}/16 dev llb-l\n" for ip in plan['hosts'])
+    ns(NS_LAN, 'ip', '-batch', '-', input=batch.encode())
+    if delay_ms:
+        ns(NS_LAN, 'tc', 'qdisc', 'add', 'dev', 'llb-l', 'root', 'netem', 'delay', f"{delay_ms}ms")
+    # ip netns exec bind-mounts /etc/netns/<ns>/hosts over /etc/hosts for the scanner
+    os.makedirs(f"/etc/netns/{NS_SCAN}", exist_ok=True)
+    with open(f"/etc/netns/{NS_SCAN}/hosts", 'w') as f:
+        f.write("127.0.0.1 localhost\n")
+        f.writelines(f"{ip} {h['name']}\n" for ip, h in plan['hosts'].items() if h['name'])
+
+# --- Lab Hosts ---
+def ber_read(data, i):
+    tag, length = data[i], data[i + 1]
+    i += 2
+    if length & 0x80:
+        n = length & 0x7f
+        length = int.from_bytes(data[i:i + n], 'big')
+        i += n
+    return tag, data[i:i + length], i + length
+
+def ber(tag, payload):
+    n = len(payload)
+    if n < 0x80:
+        return bytes((tag, n)) + payload
+    size = n.to_bytes((n.bit_length() + 7) // 8, 'big')
+    return bytes((tag, 0x80 | len(size))) + size + payload
+
+def ber_items(data):
+    i = 0
+    while i < len(data):
+        tag, value, i = ber_read(data, i)
+        yield tag, value
+
+def snmp_response(packet, ip):
+    """Answers a v1/v2c GetRequest with an OCTET STRING per requested OID."""
+    _, message, _ = ber_read(packet, 0)
+    (_, version), (_, community), (pdu_tag, pdu) = list(ber_items(message))[:3]
+    if pdu_tag != 0xa0:
+        return None
+    (_, request_id), _, _, (_, varbinds) = list(ber_items(pdu))[:4]
+    answers = b''
+    for _, varbind in ber_items(varbinds):
+        (_, oid), _ = list(ber_items(varbind))[:2]
+        answers += ber(0x30, ber(0x06, oid) + ber(0x04, f"LANLord bench host {ip}".encode()))
+    response = ber(0x02, request_id) + ber(0x02, b'\0') + ber(0x02, b'\0') + ber(0x30, answers)
+    return ber(0x30, ber(0x02, version) + ber(0x04, community) + ber(0xa2, response))
+
+def serve_lan(plan_path):
+    """Runs inside llb-lan: accepts and drops every connect, answers SNMP, until killed."""
+    import resource
+    with open(plan_path) as f:
+        plan = json.load(f)
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    sel = selectors.DefaultSelector()
+    for ip, host in plan['hosts'].items():
+        for port in host['ports']:
+            s = socket.socket()
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((ip, port))
+            s.listen(128)
+            s.setblocking(False)
+            sel.register(s, selectors.EVENT_READ, 'tcp')
+        if host['snmp']:
+            u = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            u.bind((ip, 161))
+            u.setblocking(False)
+            sel.register(u, selectors.EVENT_READ, 'snmp')
+    print('ready', flush=True)
+    while True:
+        for key, _ in sel.select():
+            sock = key.fileobj
+            try:
+                if key.data == 'tcp':
+                    sock.accept()[0].close()
+                else:
+                    packet, addr = sock.recvfrom(4096)
+                    response = snmp_response(packet, sock.getsockname()[0])
+                    if response:
+                        sock.sendto(response, addr)
+            except (OSError, ValueError, IndexError):
+                continue
+
+def start_lan(plan_path, detach=False):
+    """Starts the lab hosts; detached ones outlive the bench, in their own session and off its stderr."""
+    proc = subprocess.Popen(['ip', 'netns', 'exec', NS_LAN, sys.executable, os.path.abspath(__file__),
+                             '_lan', plan_path], stdout=subprocess.PIPE, text=True,
+                            stderr=subprocess.DEVNULL if detach else None, start_new_session=detach)
+    if proc.stdout.readline().strip() != 'ready':
+        proc.kill()
+        raise RuntimeError("lab hosts failed to start")
+    return proc
+
+# --- Stages ---
+def load_lanlord():
+    spec = importlib.util.spec_from_file_location('lanlord', LANLORD)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+def run_stages(plan_path, rate, stages):
+    """Runs inside llb-scan: times each stage against the lab and prints one JSON object."""
+    with open(plan_path) as f:
+        plan = json.load(f)
+    ll = load_lanlord()
+    budget = ll.PacketBudget(rate)
+    expected = plan['hosts']
+    live = sorted(expected, key=ll.ip_to_int)
+    report = {}
+
+    def record(stage, items, seconds, found, wanted, **extra):
+        report[stage] = dict(seconds=round(seconds, 4), items=items, found=found, expected=wanted,
+                             rate=round(items / seconds, 1) if seconds else None, **extra)
+
+    if 'arp' in stages:
+        try:
+            found, seconds = timed(lambda: ll.arp_sweep(plan['subnets'], timeout=1.0, budget=budget,
+                                                        rtt=ll.RttTable()))
+            record('arp', len(expected), seconds, sum(len(h) for h in found.values()), len(expected),
+                   probes=len(plan['subnets']) * 254)
+        except ll.MissingDependency as e:
+            report['arp'] = {'skipped': str(e)}
+    if 'icmp' in stages:
+        engine = ll.icmp_engine()
+        if engine:
+            blocks = [ll.as_block(s) for s in plan['subnets']]
+            targets = [ll.int_to_ip(a) for b in blocks for a in range(b.first, b.last + 1)]
+            found, seconds = timed(lambda: engine.sweep(targets, timeout=1.0, budget=budget, rtt=ll.RttEstimator()))
+            record('icmp', len(expected), seconds, len(found), len(expected), probes=len(targets))
+        else:
+            report['icmp'] = {'skipped': 'no ICMP socket'}
+    if 'tcp' in stages:
+        ports = ll.PortSet(plan['ports'])
+        found, seconds = timed(lambda: ll.tcp_connect_scan(live, ports, concurrency=1000, budget=budget,
+                                                           rtt=ll.RttEstimator()))
+        record('tcp', len(live), seconds, sum(len(p) for p in found.values()),
+               sum(len(h['ports']) for h in expected.values()), probes=len(live) * len(ports))
+    if 'snmp' in stages:
+        try:
+            found, seconds = timed(lambda: ll.snmp_bulk(live, timeout=1.0, budget=budget))
+            record('snmp', len(live), seconds, len(found), sum(h['snmp'] for h in expected.values()))
+        except ll.MissingDependency as e:
+            report['snmp'] = {'skipped': str(e)}
+    if 'dns' in stages:
+        found, seconds = timed(lambda: ll.DnsResolver().resolve(live, timeout=5.0))
+        record('dns', len(live), seconds, sum(1 for n in found.values() if n),
+               sum(1 for h in expected.values() if h['name']))
+    print(json.dumps(report))
+
+# --- Runs and Comparison ---
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(LANLORD),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+def run(args):
+    if os.geteuid() != 0:
+        print("LANLord-bench: needs root to build namespaces", file=sys.stderr)
+        return 1
+    ports = sorted({int(p) for p in args.ports.split(',')})
+    plan = lab_plan(args.hosts, ports, args.open, args.snmp, args.seed)
+    plan_path = f"/tmp/llb-plan-{os.getpid()}.json"
+    with open(plan_path, 'w') as f:
+        json.dump(plan, f)
+    stages = args.stages.split(',')
+    lan = None
+    short = 0
+    try:
+        print(f"🧪 Building lab: {args.hosts} host(s) in {len(plan['subnets'])} /24(s), "
+              f"{args.open} open port(s) each, {args.snmp} SNMP responder(s)", file=sys.stderr)
+        build_lab(plan, args.delay)
+        lan = start_lan(plan_path, detach=args.keep)
+        repeats = []
+        for i in range(args.repeat):
+            out = ns(NS_SCAN, sys.executable, os.path.abspath(__file__), '_stages', plan_path,
+                     str(args.rate), ','.join(stages), stdout=subprocess.PIPE, text=True).stdout
+            repeats.append(json.loads(out.strip().splitlines()[-1]))
+            print(f"   ↪ run {i + 1}/{args.repeat}: " + ', '.join(
+                f"{s} {r['rate']}/s" for s, r in repeats[-1].items() if 'rate' in r), file=sys.stderr)
+            # a rate over a partial answer set is not comparable with a full one
+            missed = [f"{s} {r['found']}/{r['expected']}" for s, r in repeats[-1].items()
+                      if r.get('found', 0) < r.get('expected', 0)]
+            if missed:
+                short += 1
+                print(f"   ⚠️ run {i + 1}/{args.repeat} found fewer than expected: {', '.join(missed)}", file=sys.stderr)
+    finally:
+        if args.keep:
+            if lan:
+                print(f"🧪 Lab left up with its listeners (pid {lan.pid}); remove it with: LANLord-bench.py teardown",
+                      file=sys.stderr)
+        else:
+            if lan:
+                lan.kill()
+            teardown()
+        os.remove(plan_path)
+    summary = {}
+    for stage in stages:
+        runs = [r[stage] for r in repeats if stage in r]
+        if not runs or 'skipped' in runs[0]:
+            summary[stage] = runs[0] if runs else {'skipped': 'not run'}
+            continue
+        summary[stage] = dict(runs[-1], rate=median([r['rate'] for r in runs]),
+                              seconds=median([r['seconds'] for r in runs]))
+    entry = {
+        'label': args.label, 'time': datetime.now().isoformat(timespec='seconds'), 'revision': git_revision(),
+        'lab': {'hosts': args.hosts, 'ports': ports, 'open': args.open, 'snmp': args.snmp, 'seed': args.seed,
+                'delay_ms': args.delay, 'rate': args.rate, 'repeat': args.repeat},
+        'stages': summary,
+    }
+    with open(args.results, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+    print_table([entry])
+    if short:
+        print(f"LANLord-bench: {short}/{args.repeat} run(s) missed hosts, the stored rates are not comparable",
+              file=sys.stderr)
+        return 1
+    return 0
+
+def print_table(entries):
+    names = [e['label'] or e['revision'] or e['time'] for e in entries]
+    print(f"{'stage':<6}" + ''.join(f"{n:>22}" for n in names))
+    for stage in STAGES:
+        cells = []
+        for e in entries:
+            r = e['stages'].get(stage)
+            if not r or 'rate' not in r:
+                cells.append('skipped' if r else '-')
+            else:
+                cells.append(f"{r['rate']:.0f} h/s ({r['found']}/{r['expected']})")
+        if any(c != '-' for c in cells):
+            print(f"{stage:<6}" + ''.join(f"{c:>22}" for c in cells))
+    if len(entries) == 2:
+        a, b = (e['stages'] for e in entries)
+        for stage in STAGES:
+            if a.get(stage, {}).get('rate') and b.get(stage, {}).get('rate'):
+                print(f"   ↪ {stage}: {b[stage]['rate'] / a[stage]['rate']:.2f}x")
+
+def compare(args):
+    with open(args.results) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    if not entries:
+        print("LANLord-bench: no results yet", file=sys.stderr)
+        return 1
+
+    def pick(key):
+        for e in reversed(entries):
+            if key in (e['label'], e['revision']):
+                return e
+        return entries[int(key)]
+
+    try:
+        chosen = [pick(k) for k in args.runs] if args.runs else entries[-2:]
+    except (ValueError, IndexError):
+        print(f"LANLord-bench: no run matches {args.runs}", file=sys.stderr)
+        return 1
+    print_table(chosen)
+    return 0
+
+def host_count(value):
+    hosts = int(value)
+    if not 0 < hosts <= MAX_HOSTS:
+        raise argparse.ArgumentTypeError(f"must be 1-{MAX_HOSTS} ({HOSTS_PER_SUBNET} per /24 in 10.213.0-254.0/24)")
+    return hosts
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='LANLord-bench.py', description=__doc__.split('\n\n')[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    r = sub.add_parser('run', help='build the lab, time every stage, append the result')
+    r.add_argument('--hosts', type=host_count, default=200, help=f'responsive hosts, up to {MAX_HOSTS} (default: 200)')
+    r.add_argument('--ports', default='22,80,135,139,443,445,3389,8080', help='ports hosts may listen on')
+    r.add_argument('--open', type=int, default=2, help='open ports per host (default: 2)')
+    r.add_argument('--snmp', type=int, default=20, help='hosts answering SNMP (default: 20)')
+    r.add_argument('--delay', type=float, default=0, help='extra latency in ms via netem')
+    r.add_argument('--rate', type=int, default=0, help='packets/s budget for the probes (default: unlimited)')
+    r.add_argument('--stages', default=','.join(STAGES), help='comma-separated stages to time')
+    r.add_argument('--repeat', type=int, default=3, help='runs per stage, the median is stored')
+    r.add_argument('--seed', type=int, default=1, help='seed for the lab layout')
+    r.add_argument('--label', help='name to compare this run by')
+    r.add_argument('--results', default=RESULTS, help=f'results file (default: {RESULTS})')
+    r.add_argument('--keep', action='store_true', help='leave the lab and its listeners up afterwards')
+    c = sub.add_parser('compare', help='show stored runs side by side')
+    c.add_argument('runs', nargs='*', help='labels, revisions or indexes (default: last two)')
+    c.add_argument('--results', default=RESULTS)
+    sub.add_parser('teardown', help='remove the lab namespaces')
+    lan = sub.add_parser('_lan')
+    lan.add_argument('plan')
+    stages = sub.add_parser('_stages')
+    stages.add_argument('plan')
+    stages.add_argument('rate', type=int)
+    stages.add_argument('stages')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'run':
+        return run(args)
+    if args.command == 'compare':
+        return compare(args)
+    if args.command == 'teardown':
+        teardown()
+        return 0
+    if args.command == '_lan':
+        serve_lan(args.plan)
+        return 0
+    run_stages(args.plan, args.rate, args.stages.split(','))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
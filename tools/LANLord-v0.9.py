@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 """
-LANLord v0.9 
+LANLord v0.9
 
-Dependencies auto-install:
+Dependencies (loaded on first use, install with --install-deps):
 - scapy
 - pysnmp
 
@@ -11,270 +11,2529 @@ Features:
 - Quick Scan: common local subnets
 - Manual Scan: custom IP/CIDR input
 - Deep Scan: optional SNMP-based enrichment
+
+Usage:
+  LANLord-v0.9.py                               start the GUI
+  LANLord-v0.9.py scan quick --deep             headless scan, one JSON host per line on stdout
+  LANLord-v0.9.py scan 10.0.0.0/16 -v           log progress to stderr as well
+  LANLord-v0.9.py scan sweep -o sweep.jsonl     also append hosts to a file as they finish
+  LANLord-v0.9.py render sweep.jsonl            Markdown report from a results file
+  LANLord-v0.9.py scan quick --deep --db inv.db record hosts in a SQLite inventory
+  LANLord-v0.9.py query --db inv.db --port 22 --cidr 10.0.0.0/16
+  LANLord-v0.9.py scan 10.0.0.0/24 --deep -p top100,8000-8100
+  LANLord-v0.9.py scan sweep --metrics-port 9464 Prometheus metrics while it runs
+  LANLord-v0.9.py scan quick --deep --profile prof  pstats and a top-N summary per scan phase
+  LANLord-v0.9.py scan sweep --shards 0        one worker process per core
+  LANLord-v0.9.py scan sweep --auto-rate        find the fastest packet rate that loses nothing
+  LANLord-v0.9.py coordinator 10.0.0.0/8 --bind 0.0.0.0 -o all.jsonl   lease /16 units to workers
+  LANLord-v0.9.py worker coord-host:7331        scan whatever the coordinator hands out
+  LANLord-v0.9.py footprint                     memory per stored host record
+  LANLord-v0.9.py --install-deps                pip install whatever is missing, then start
+  LANLord-v0.9.py --import-times scan quick     report what each lazy import cost
+
+The engine (ScanConfig, Scanner, ScanResult) can also be loaded from other
+scripts with importlib; nothing touches Tk until the GUI is started.
 """
+import time
+STARTED = time.perf_counter()  # before any other import, so "ready" timings include them
+import os
 import sys
+import importlib
+import importlib.util
+import csv
+import json
+import queue
+import sqlite3
+import errno
+import bisect
+import signal
+import select
+import asyncio
+import struct
+import argparse
 import subprocess
 import threading
 import platform
 import ipaddress
+import itertools
+import contextlib
+import hmac
+import tempfile
+import concurrent.futures
+from array import array
+from collections import deque, namedtuple
+from dataclasses import dataclass
 from datetime import datetime
 import socket
-import tkinter as tk
-from tkinter import scrolledtext, messagebox
+try:
+    import tkinter as tk
+    from tkinter import scrolledtext, messagebox
+except ImportError:  # headless boxes often ship without Tk
+    tk = None
+
+
+# --- Scan Config and Results ---
+@dataclass
+class ScanConfig:
+    """Everything a scan needs to know; the GUI and CLI both build one of these."""
+    deep: bool = False
+    packet_rate: int = 5000
+    auto_rate: bool = False
+    rate_ceiling: int = 50000
+    connect_limit: int = 1000
+    subnet_width: int = 8
+    arp_timeout: float = 2.0
+    icmp_timeout: float = 1.0
+    tcp_timeout: float = 0.3
+    ports: str = 'well-known'
+    keep_hosts: bool = True
+    incremental: bool = False
+    stale_after: float = 86400.0
+    snmp_community: str = 'public'
+    snmp_timeout: float = 1.0
+    snmp_concurrency: int = 256
+    dns_timeout: float = 2.0
+    adaptive_timeouts: bool = True
+    dns_workers: int = 2
+    snmp_workers: int = 2
+    port_workers: int = 4
+    stage_batch: int = 64
+    stage_depth: int = 1024
+    chunk_blocks: int = 1024
+    profile_dir: str = None
+    profile_top: int = 15
+    shard: int = 0
+    shards: int = 1
+
+class ScanResult:
+    """
+    Hosts found by one scan plus when it ran and whether it was stopped.
+
+    hosts stays empty when the config has keep_hosts off; long sweeps stream
+    hosts out through on_host instead and only the count is kept.
+    """
+    def __init__(self, mode, target=None):
+        self.mode = mode
+        self.target = target
+        self.hosts = []
+        self.count = 0
+        self.started = datetime.now()
+        self.finished = None
+        self.stopped = False
+
+    def summary(self):
+        return {
+            "mode": self.mode,
+            "target": self.target,
+            "hosts": self.count,
+            "started": self.started.isoformat(timespec='seconds'),
+            "finished": self.finished.isoformat(timespec='seconds') if self.finished else None,
+            "stopped": self.stopped,
+        }
 
+# --- Host Records ---
+_subnet_names = []
+_subnet_ids = {}
+_subnet_lock = threading.Lock()
 
-# --- Auto Dependency Installer ---
-REQUIRED_MODULES = [('scapy', 'scapy'), ('pysnmp', 'pysnmp')]
-for mod, pkg in REQUIRED_MODULES:
+def subnet_id(name):
+    """Interns a subnet string; hosts keep the small id instead of their own copy."""
     try:
-        __import__(mod)
-    except ImportError:
-        subprocess.call([sys.executable, '-m', 'pip', 'uninstall', '-y', pkg])
-        subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--force-reinstall', pkg])
+        return _subnet_ids[name]
+    except KeyError:
+        with _subnet_lock:
+            if name not in _subnet_ids:
+                _subnet_ids[name] = len(_subnet_names)
+                _subnet_names.append(name)
+            return _subnet_ids[name]
 
-from scapy.all import ARP, Ether, srp, conf
-# --- Fix broken pysnmp installations ---
-try:
-    from pysnmp.hlapi.v3arch.asyncio import get_cmd as getCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
-except ImportError:
-    import importlib
-    subprocess.call([sys.executable, '-m', 'pip', 'uninstall', '-y', 'pysnmp'])
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--force-reinstall', 'pysnmp'])
-    importlib.invalidate_caches()
-    from pysnmp.hlapi.v3arch.asyncio import get_cmd as getCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
-except ImportError:
-    import importlib
-    subprocess.call([sys.executable, '-m', 'pip', 'uninstall', '-y', 'pysnmp'])
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--force-reinstall', 'pysnmp'])
+def ip_to_int(ip):
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+def int_to_ip(addr):
+    return socket.inet_ntoa(struct.pack('!I', addr))
+
+class HostRecord:
+    """
+    One discovered host, kept small enough for sweeps of millions of addresses.
+
+    The address and MAC are ints, the subnet an interned id, and hostname
+    is only stored when it differs from the address. The string views
+    (ip, mac, hostname, subnet) are built on access, and host['ip'] style
+    access still works for code written against the old host dicts.
+    """
+    __slots__ = ('addr', 'hw', 'name', 'net', 'os', 'ports', 'snmp', 'filtered')
+    FIELDS = ('ip', 'mac', 'hostname', 'subnet', 'os', 'ports', 'snmp', 'filtered')
+
+    def __init__(self, ip, subnet, mac=None, hostname=None, os='', ports=()):
+        self.addr = ip if isinstance(ip, int) else ip_to_int(ip)
+        self.mac = mac
+        self.net = subnet_id(subnet)
+        self.name = None
+        self.hostname = hostname
+        self.os = os
+        self.ports = ports
+        self.snmp = None
+        self.filtered = False
+
+    @property
+    def ip(self):
+        return int_to_ip(self.addr)
+
+    @property
+    def subnet(self):
+        return _subnet_names[self.net]
+
+    @property
+    def mac(self):
+        if self.hw is None:
+            return '?'
+        return ':'.join(f'{b:02x}' for b in self.hw.to_bytes(6, 'big'))
+
+    @mac.setter
+    def mac(self, mac):
+        self.hw = int(mac.replace(':', '').replace('-', ''), 16) if mac and mac != '?' else None
+
+    @property
+    def hostname(self):
+        return self.name or self.ip
+
+    @hostname.setter
+    def hostname(self, name):
+        self.name = name if name and name != self.ip else None
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.FIELDS else None
+        return default if value is None else value
+
+    def to_dict(self):
+        """The host as the plain dict written to results files."""
+        record = {"ip": self.ip, "mac": self.mac, "hostname": self.hostname, "subnet": self.subnet,
+                  "os": self.os, "ports": list(self.ports)}
+        if self.snmp:
+            record["snmp"] = self.snmp
+        if self.filtered:
+            record["filtered"] = True
+        return record
+
+    @classmethod
+    def from_dict(cls, record):
+        """Rebuilds a host from to_dict() output, e.g. a line of a results stream."""
+        host = cls(record['ip'], record['subnet'], mac=record.get('mac'), hostname=record.get('hostname'),
+                   os=record.get('os', ''), ports=tuple(record.get('ports', ())))
+        host.snmp = record.get('snmp')
+        host.filtered = record.get('filtered', False)
+        return host
+
+    def __repr__(self):
+        return f"HostRecord({self.to_dict()!r})"
+
+# open-port mixes host_footprint cycles through: none, one, a handful, rare and high ports
+FOOTPRINT_PORTS = ((), (22,), (80, 443), (22, 80, 443, 3306), (135, 139, 445, 3389, 5985),
+                   (27017,), (8080, 9100, 60000), (21, 22, 23, 80, 161, 443, 8443, 10000))
+
+def host_footprint(count=10000):
+    """
+    Measures bytes per host with tracemalloc for deep-scan hosts whose open
+    ports cycle through FOOTPRINT_PORTS, as a HostRecord and as the
+    equivalent plain dict. Returns (record, dict).
+    """
+    import tracemalloc
+    mix = FOOTPRINT_PORTS
+    results = []
+    for make in (lambda i: HostRecord(0x0a000000 + i, f"10.0.{i >> 8 & 0xff}.0/24", mac=f"aa:bb:cc:dd:{i >> 8 & 0xff:02x}:{i & 0xff:02x}",
+                                      os='Linux 6.1', ports=OpenPorts(mix[i % len(mix)])),
+                 lambda i: {"ip": int_to_ip(0x0a000000 + i), "mac": f"aa:bb:cc:dd:{i >> 8 & 0xff:02x}:{i & 0xff:02x}",
+                            "hostname": int_to_ip(0x0a000000 + i), "subnet": f"10.0.{i >> 8 & 0xff}.0/24",
+                            "os": 'Linux 6.1', "ports": list(mix[i % len(mix)])}):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        hosts = [make(i) for i in range(count)]
+        results.append((tracemalloc.get_traced_memory()[0] - before) / count)
+        tracemalloc.stop()
+        del hosts
+    return tuple(results)
+
+def _no_log(msg, tag=None):
+    pass
+
+# --- Lazy Dependencies ---
+IMPORT_TIMES = {}
+PIP_PACKAGES = {'scapy': 'scapy', 'pysnmp': 'pysnmp'}
+
+class MissingDependency(ImportError):
+    pass
+
+def lazy_import(name, log=_no_log):
+    """Imports a module on first use and records what the import cost."""
+    if name in sys.modules:
+        return importlib.import_module(name)
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(name)
+    except ImportError as e:
+        package = PIP_PACKAGES.get(name.split('.')[0], name.split('.')[0])
+        raise MissingDependency(f"{package} is not installed (pip install {package}, or start with --install-deps)") from e
+    IMPORT_TIMES[name] = time.perf_counter() - start
+    log(f"⏱ Loaded {name} in {IMPORT_TIMES[name] * 1000:.0f} ms")
+    return module
+
+def install_dependencies(log=_no_log):
+    """Pip-installs missing packages; only ever run when asked for."""
+    for module, package in PIP_PACKAGES.items():
+        if importlib.util.find_spec(module) is None:
+            log(f"📦 Installing {package}...")
+            subprocess.check_call([sys.executable, '-m', 'pip', 'install', package])
     importlib.invalidate_caches()
-    from pysnmp.hlapi import getCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
-conf.verb = 0
-
-# --- Global State ---
-is_deep_scan = False
-stop_flag = False
-loot = []
-window = tk.Tk()
-port_thread_limit = tk.IntVar(value=50)
-window.title('LANLord v0.9')
-window.configure(bg='#1e1e1e')
-
-# --- GUI Logging ---
-def log(msg, tag=None):
-    if output:
-        output.after(0, lambda: output.insert(tk.END, msg + '\n', tag))
-        output.after(0, output.see, tk.END)
-
-def clear_log():
-    if output:
-        output.delete('1.0', tk.END)
-
-# --- SNMP, ARP, ICMP, and TCP Scan ---
-def enrich_host_ports(host):
-    import socket
-    import concurrent.futures
-    ip = host['ip']
-    open_ports = []
-    log(f"   ↪ Scanning all 0-1023 ports on {ip} with up to {port_thread_limit.get()} threads...")
-
-    def scan_port(port):
-        if stop_flag:
-            return None
+
+def scapy_l2(log=_no_log):
+    """Only the scapy pieces an ARP sweep needs, instead of all of scapy.all."""
+    l2 = lazy_import('scapy.layers.l2', log)
+    sendrecv = lazy_import('scapy.sendrecv', log)
+    lazy_import('scapy.route', log)
+    conf = lazy_import('scapy.config', log).conf
+    conf.verb = 0
+    return l2.ARP, l2.Ether, sendrecv.AsyncSniffer, lazy_import('scapy.compat', log).raw, conf
+
+def snmp_api(log=_no_log):
+    """
+    Returns (hlapi module, get command, is_async) for whichever pysnmp layout
+    is installed: the asyncio API of pysnmp 7 or 6, else the old synchronous one.
+    """
+    for name, command in (('pysnmp.hlapi.v3arch.asyncio', 'get_cmd'), ('pysnmp.hlapi.asyncio', 'getCmd')):
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(0.3)
-                result = s.connect_ex((ip, port))
-                if result == 0:
-                    return port
-        except Exception:
-            return None
+            hlapi = lazy_import(name, log)
+            return hlapi, getattr(hlapi, command), True
+        except (MissingDependency, AttributeError):
+            continue
+    hlapi = lazy_import('pysnmp.hlapi', log)
+    return hlapi, hlapi.getCmd, False
+
+# --- Packet Budget ---
+class PacketBudget:
+    """
+    Global packets-per-second budget shared by every probe engine.
+
+    reserve() hands out send slots on a virtual clock and returns how long
+    the caller should wait before using its slot, so threads and event loops
+    can both pace against it. A rate of 0 means unlimited.
+    """
+    def __init__(self, rate=0, burst=0.05):
+        self.lock = threading.Lock()
+        self.burst = burst
+        self.next_free = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.rate = rate
+            self.interval = 1.0 / rate if rate else 0.0
+
+    def reserve(self, n=1):
+        if not self.interval:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            start = max(self.next_free, now - self.burst)
+            self.next_free = start + n * self.interval
+            return start - now
+
+    def acquire(self, n=1):
+        delay = self.reserve(n)
+        if delay > 0.001:
+            time.sleep(delay)
+
+AUTO_RATE_START = 1000
+AUTO_RATE_FLOOR = 100
+RATE_PERIOD = 0.5
+RATE_BACKOFF = 0.5
+RATE_LOSS = 0.25  # a stage answering this fraction less than its clean average counts as loss
+RATE_MIN_PROBES = 50  # probes a stage must send in a period before its reply ratio counts
+RATE_MIN_DROPS = 20  # kernel drops a period needs before they count as loss, whatever was sent
+RATE_DROP_SHARE = 0.01  # ... or this share of the period's probes, if more
+RATE_STAGES = ('arp', 'icmp', 'tcp', 'snmp')  # the stages that draw on the budget
+
+def kernel_drops():
+    """
+    Packets the local kernel has dropped so far: interface transmit drops,
+    IP output discards and UDP and raw socket buffer overflows. None where
+    /proc/net is missing (anything but Linux). Receive drops on interfaces
+    are left out, as many drivers also count unknown protocols there.
+    """
+    try:
+        total = 0
+        with open('/proc/net/dev') as f:
+            for line in itertools.islice(f, 2, None):
+                total += int(line.split(':', 1)[1].split()[11])
+        with open('/proc/net/snmp') as f:
+            rows = [line.split() for line in f]
+        for head, values in zip(rows[::2], rows[1::2]):
+            stats = dict(zip(head[1:], map(int, values[1:])))
+            if head[0] == 'Ip:':
+                total += stats.get('OutDiscards', 0)
+            elif head[0] == 'Udp:':
+                total += stats.get('RcvbufErrors', 0) + stats.get('SndbufErrors', 0)
+        with open('/proc/net/raw') as f:
+            total += sum(int(line.split()[-1]) for line in itertools.islice(f, 1, None))
+        return total
+    except (OSError, ValueError, IndexError):
         return None
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=port_thread_limit.get()) as executor:
-        futures = {executor.submit(scan_port, p): p for p in range(1, 1024)}
-        for idx, (future, port) in enumerate(futures.items()):
-            if stop_flag:
-                break
+class AdaptiveBudget(PacketBudget):
+    """
+    PacketBudget that finds its own rate, AIMD style.
+
+    Every RATE_PERIOD it looks back at the scan's Metrics and the kernel:
+    kernel drops past RATE_MIN_DROPS (or RATE_DROP_SHARE of the probes
+    sent), sends retried on a full socket buffer, or a stage answering
+    RATE_LOSS below its own average over clean periods all count as loss
+    and halve the rate (not below floor), after which one period is skipped
+    since its replies still reflect the old rate. A clean period in which
+    callers had to wait for slots adds step packets/s, up to ceiling.
+    Reply ratios are compared per stage, as a TCP sweep of filtered ports
+    answers far less than an ARP sweep without anything being lost; and a
+    stage whose ratio stays down after its back-off is taken to have moved
+    on to sparser targets, so its average restarts from there.
+    """
+    def __init__(self, rate, metrics, floor=AUTO_RATE_FLOOR, ceiling=50000, step=None, period=RATE_PERIOD):
+        super().__init__(min(max(rate or AUTO_RATE_START, floor), ceiling))
+        self.metrics = metrics
+        self.floor = floor
+        self.ceiling = ceiling
+        self.step = step or max(floor, ceiling // 50)
+        self.period = period
+        self.tuning = threading.Lock()
+        self.next_tune = time.monotonic() + period
+        self.waited = False
+        self.hold = False
+        self.reference = {}
+        self.suspects = set()
+        self.last = metrics.stage_totals()
+        self.drops = kernel_drops()
+        self.backoffs = 0
+        metrics.set('packet_rate', self.rate)
+
+    def reserve(self, n=1):
+        delay = super().reserve(n)
+        if delay > 0:
+            self.waited = True
+        if time.monotonic() >= self.next_tune and self.tuning.acquire(blocking=False):
             try:
-                result = future.result()
-                if result:
-                    open_ports.append(result)
-                    log(f"     • Port {result}/TCP is open")
+                self._tune()
+            finally:
+                self.tuning.release()
+        return delay
+
+    def _tune(self):
+        self.next_tune = time.monotonic() + self.period
+        totals, drops = self.metrics.stage_totals(), kernel_drops()
+        last, self.last = self.last, totals
+        dropped = drops - self.drops if drops is not None and self.drops is not None else 0
+        self.drops = drops
+        waited, self.waited = self.waited, False
+        if self.hold:
+            self.hold = False
+            return
+        ratios, lost, total = {}, set(), 0
+        for stage in RATE_STAGES:
+            now, before = totals.get(stage, {}), last.get(stage, {})
+            if now.get('retries', 0) > before.get('retries', 0):
+                lost.add('retries')
+            dropped += now.get('drops', 0) - before.get('drops', 0)
+            sent = now.get('probes_sent', 0) - before.get('probes_sent', 0)
+            total += sent
+            if sent < RATE_MIN_PROBES:
+                continue
+            ratios[stage] = (now.get('replies', 0) - before.get('replies', 0)) / sent
+            reference = self.reference.get(stage)
+            if reference is not None and ratios[stage] < reference * (1 - RATE_LOSS):
+                if stage in self.suspects:
+                    # backing off did not bring the answers back: the targets changed, not the path
+                    self.reference[stage] = ratios[stage]
+                else:
+                    lost.add(stage)
+        if dropped > max(RATE_MIN_DROPS, total * RATE_DROP_SHARE):
+            lost.add('drops')
+        self.suspects = lost
+        if lost:
+            self.backoffs += 1
+            self.metrics.inc('rate_backoffs')
+            self.hold = True
+            rate = max(self.floor, int(self.rate * RATE_BACKOFF))
+        else:
+            for stage, ratio in ratios.items():
+                reference = self.reference.get(stage)
+                self.reference[stage] = ratio if reference is None else 0.75 * reference + 0.25 * ratio
+            rate = min(self.ceiling, self.rate + self.step) if waited else self.rate
+        if rate != self.rate:
+            self.set_rate(rate)
+            self.metrics.set('packet_rate', rate)
+
+# --- RTT Estimation ---
+class RttEstimator:
+    """
+    Smoothed RTT and variance as in TCP (RFC 6298), fed by every answered
+    probe. timeout(default) gives SRTT + 4*RTTVAR clamped to [floor, ceiling],
+    or the caller's default until the first sample arrives.
+    """
+    def __init__(self, floor=0.02, ceiling=3.0):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.srtt = None
+        self.rttvar = None
+        self.samples = 0
+        self.lock = threading.Lock()
+
+    def sample(self, rtt):
+        with self.lock:
+            if self.srtt is None:
+                self.srtt, self.rttvar = rtt, rtt / 2
+            else:
+                self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+                self.srtt = 0.875 * self.srtt + 0.125 * rtt
+            self.samples += 1
+
+    def timeout(self, default):
+        if self.srtt is None:
+            return default
+        return min(self.ceiling, max(self.floor, self.srtt + 4 * self.rttvar))
+
+RTT_PROBES = ('arp', 'icmp', 'tcp')
+
+class RttTable:
+    """
+    One RttEstimator per key (a subnet, or an interface for ARP), created on
+    first use. A table only takes samples from one probe type: ARP and ICMP
+    answer from the kernel far sooner than a connect does.
+    """
+    def __init__(self):
+        self.estimators = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.estimators:
+                self.estimators[key] = RttEstimator()
+            return self.estimators[key]
+
+# --- Scan Metrics ---
+SCAN_STAGES = ('liveness', 'arp', 'icmp', 'triage', 'dns', 'snmp', 'ports', 'tcp', 'export')
+RTT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+METRIC_HELP = {
+    'probes_sent': ('counter', 'Probes sent, per stage'),
+    'replies': ('counter', 'Probes that got an answer'),
+    'timeouts': ('counter', 'Probes that got no answer in time'),
+    'retries': ('counter', 'Sends repeated after a full socket buffer'),
+    'drops': ('counter', 'Replies the kernel dropped before LANLord could read them'),
+    'inflight': ('gauge', 'Probes sent and not yet answered or expired'),
+    'stage_seconds': ('counter', 'Busy time per stage, summed over its workers'),
+    'stage_hosts': ('counter', 'Hosts through each enrichment stage'),
+    'queue_depth': ('gauge', 'Hosts waiting in front of each enrichment stage'),
+    'hosts': ('counter', 'Hosts recorded by the scan'),
+    'packet_rate': ('gauge', 'Packets/s the budget currently allows'),
+    'rate_backoffs': ('counter', 'Times the auto rate backed off after loss'),
+    'rtt_seconds': ('histogram', 'Round-trip time of answered probes'),
+}
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(RTT_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(RTT_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile; None when empty or past the last bucket."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(RTT_BUCKETS, self.counts):
+            seen += n
+            if n and seen >= rank:
+                return bound
+        return None
+
+class Metrics:
+    """
+    Counters, gauges and RTT histograms for one scan, keyed by name and labels.
+
+    Engines take an optional metrics argument, like budget and rtt, and
+    update it as probes go out and answers come back; the Scanner adds stage
+    timings. Any thread may read it while the scan runs: snapshot() gives
+    plain JSON, prometheus() the text exposition format.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """Adds the wall time of the with-block to stage_seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc('stage_seconds', time.perf_counter() - start, stage=stage)
+
+    def get(self, name, **labels):
+        with self.lock:
+            return self.values.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        with self.lock:
+            values = [{'name': name, 'labels': dict(labels), 'value': value}
+                      for (name, labels), value in sorted(self.values.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': h.count, 'sum': h.sum,
+                           'buckets': dict(zip([*map(str, RTT_BUCKETS), '+Inf'], itertools.accumulate(h.counts)))}
+                          for (name, labels), h in sorted(self.histograms.items())]
+        return {'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'elapsed': round(time.time() - self.started, 3), 'values': values, 'histograms': histograms}
+
+    def prometheus(self):
+        def series(name, labels, extra=()):
+            pairs = [*labels, *extra]
+            body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+            return f"lanlord_{name}{{{body}}}" if body else f"lanlord_{name}"
+
+        lines, typed = [], set()
+
+        def header(name, suffix=''):
+            if name not in typed:
+                typed.add(name)
+                kind, text = METRIC_HELP.get(name, ('untyped', name))
+                lines.append(f"# HELP lanlord_{name}{suffix} {text}")
+                lines.append(f"# TYPE lanlord_{name}{suffix} {kind}")
+
+        with self.lock:
+            for (name, labels), value in sorted(self.values.items()):
+                counter = METRIC_HELP.get(name, ('untyped',))[0] == 'counter'
+                header(name, '_total' if counter else '')
+                lines.append(f"{series(name + ('_total' if counter else ''), labels)} {value:g}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                header(name)
+                for bound, total in zip([*map(str, RTT_BUCKETS), '+Inf'], itertools.accumulate(h.counts)):
+                    lines.append(f"{series(name + '_bucket', labels, [('le', bound)])} {total}")
+                lines.append(f"{series(name + '_sum', labels)} {h.sum:g}")
+                lines.append(f"{series(name + '_count', labels)} {h.count}")
+        return '\n'.join(lines) + '\n'
+
+    def stage_totals(self):
+        """{stage: {name: value}}, summed over every other label."""
+        with self.lock:
+            stages = {}
+            for (name, labels), value in self.values.items():
+                stage = dict(labels).get('stage')
+                if stage:
+                    totals = stages.setdefault(stage, {})
+                    totals[name] = totals.get(name, 0) + value
+        return stages
+
+    def table(self):
+        """One line per stage for people: probes, answers, in flight, busy time and RTT quantiles."""
+        stages = self.stage_totals()
+        with self.lock:
+            rtts = {}
+            for (name, labels), h in self.histograms.items():
+                stage = dict(labels).get('stage')
+                merged = rtts.setdefault(stage, Histogram())
+                merged.counts = [a + b for a, b in zip(merged.counts, h.counts)]
+                merged.count += h.count
+                merged.sum += h.sum
+        lines = [f"{'stage':<8}{'sent':>9}{'replies':>9}{'timeouts':>9}{'retries':>8}{'inflight':>9}"
+                 f"{'hosts':>8}{'busy s':>9}{'rtt p50':>9}{'rtt p95':>9}"]
+
+        def ms(seconds):
+            return f"{seconds * 1000:.1f}ms" if seconds else '-'
+
+        for stage in sorted(stages, key=lambda s: (SCAN_STAGES.index(s) if s in SCAN_STAGES else len(SCAN_STAGES), s)):
+            v, h = stages[stage], rtts.get(stage)
+            lines.append(f"{stage:<8}{v.get('probes_sent', 0):>9.0f}{v.get('replies', 0):>9.0f}{v.get('timeouts', 0):>9.0f}"
+                         f"{v.get('retries', 0):>8.0f}{v.get('inflight', 0):>9.0f}{v.get('stage_hosts', 0):>8.0f}"
+                         f"{v.get('stage_seconds', 0):>9.2f}{ms(h and h.quantile(0.5)):>9}{ms(h and h.quantile(0.95)):>9}")
+        rate = self.get('packet_rate')
+        lines.append(f"{self.get('hosts')} host(s) recorded in {time.time() - self.started:.1f} s"
+                     + (f", auto rate {rate:.0f} packets/s" if rate else ''))
+        return '\n'.join(lines)
+
+def serve_metrics(metrics, port, host='127.0.0.1'):
+    """Serves metrics.prometheus() at /metrics from a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+# --- Phase Profiling ---
+class PhaseProfiler:
+    """
+    cProfile capture per scan phase (arp, icmp, dns, snmp, ports, export).
+
+    Every entry into a phase runs under its own profiler in the calling
+    thread, and the results are merged per phase, so phases running side by
+    side in different threads stay apart. dump() writes <phase>.pstats and a
+    top-N summary.txt into directory. Python 3.12+ allows only one active
+    profiler per process; a phase entered while another one is being
+    profiled runs unprofiled and is counted as skipped. Without a directory
+    phase() is a null context and wrap() returns fn itself, so profiling
+    off costs nothing.
+    """
+    def __init__(self, directory=None, top=15):
+        self.directory = directory
+        self.top = top
+        self.stats = {}
+        self.calls = {}
+        self.skipped = {}
+        self.lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.directory)
+
+    def phase(self, name):
+        if not self.directory:
+            return contextlib.nullcontext()
+        return self._profile(name)
+
+    def wrap(self, name, fn):
+        if not self.directory:
+            return fn
+
+        def profiled(*args, **kwargs):
+            with self._profile(name):
+                return fn(*args, **kwargs)
+        return profiled
+
+    @contextlib.contextmanager
+    def _profile(self, name):
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            with self.lock:
+                self.skipped[name] = self.skipped.get(name, 0) + 1
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._merge(name, profiler)
+
+    def _merge(self, name, profiler):
+        import pstats
+        with self.lock:
+            if name in self.stats:
+                self.stats[name].add(profiler)
+            else:
+                self.stats[name] = pstats.Stats(profiler)
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def dump(self, log=_no_log):
+        """Writes the pstats files and summary; returns the summary path, or None if nothing was captured."""
+        import io
+        with self.lock:
+            phases = sorted(self.stats, key=lambda p: SCAN_STAGES.index(p) if p in SCAN_STAGES else len(SCAN_STAGES))
+            if not phases:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            summary = io.StringIO()
+            for phase in phases:
+                stats = self.stats[phase]
+                stats.dump_stats(os.path.join(self.directory, f"{phase}.pstats"))
+                skipped = self.skipped.get(phase, 0)
+                summary.write(f"=== {phase}: {self.calls[phase]} profiled run(s), {stats.total_tt:.3f} s"
+                              f"{f', {skipped} run(s) skipped' if skipped else ''} ===\n")
+                stats.stream = summary
+                stats.sort_stats('cumulative').print_stats(self.top)
+        path = os.path.join(self.directory, 'summary.txt')
+        with open(path, 'w') as f:
+            f.write(summary.getvalue())
+        log(f"🔬 Profiles for {', '.join(phases)} written to {self.directory} (top {self.top} in {path})")
+        return path
+
+# --- Port Profiles ---
+# most frequently open TCP ports first (nmap-services ranking)
+TOP_PORTS = (
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995, 993, 5900,
+    1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554,
+    26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800, 106,
+    2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144, 7, 389, 8009, 3128, 444, 9999, 5009,
+    7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37,
+)
+PORT_PROFILES = {
+    'well-known': '1-1023',
+    'all': '1-65535',
+    'web': '80,81,443,591,3000,5000,8000,8008,8080,8081,8443,8888,9443',
+    'windows': '88,135,139,389,445,464,593,636,3268,3269,3389,5985,5986',
+    'db': '1433,1521,3306,5432,5984,6379,9042,9200,11211,27017',
+    'mgmt': '22,23,161,623,2222,5900,8291,9100,10000',
+}
+
+_TOP_RANK = {port: rank for rank, port in enumerate(TOP_PORTS)}
+
+def port_rank(port):
+    """Probe order: the TOP_PORTS ranking, then everything else numerically."""
+    return _TOP_RANK.get(port, len(TOP_PORTS) + port)
+
+class PortSet:
+    """An ordered set of TCP ports to probe, most likely open first."""
+    def __init__(self, ports, spec=None):
+        self.order = array('H', sorted(set(ports), key=port_rank))
+        self.spec = spec or f"{len(self.order)} ports"
+        # port -> position + 1, 0 when absent; 128 KiB covers every port
+        self.slots = array('H', bytes(2 * 65536))
+        for i, port in enumerate(self.order):
+            self.slots[port] = i + 1
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __contains__(self, port):
+        return 0 < port < 65536 and self.slots[port] != 0
+
+class OpenPorts:
+    """
+    Open ports of one host, packed as sorted 16-bit words; iterates like the
+    sorted list it replaces. A host costs 33 bytes plus 2 per open port,
+    whichever ports they are and however large the probed set was.
+    """
+    __slots__ = ('packed',)
+
+    def __init__(self, ports=()):
+        self.packed = array('H', sorted(set(ports))).tobytes()
+
+    def __iter__(self):
+        return iter(array('H', self.packed))
+
+    def __len__(self):
+        return len(self.packed) // 2
+
+    def __bool__(self):
+        return bool(self.packed)
+
+    def __repr__(self):
+        return repr(list(self))
+
+def parse_ports(spec):
+    """
+    Compiles a port spec into a PortSet. Accepts comma-separated profile
+    names (see PORT_PROFILES), "topN" for the N likeliest ports (N up to
+    the length of TOP_PORTS), single ports and "a-b" ranges, e.g.
+    "top100,8000-8100,web". Raises ValueError.
+    """
+    if isinstance(spec, PortSet):
+        return spec
+    if not isinstance(spec, str):
+        return PortSet(spec)
+    ports = set()
+    for token in spec.replace(' ', '').lower().split(','):
+        if not token:
+            continue
+        if token in PORT_PROFILES:
+            ports |= set(parse_ports(PORT_PROFILES[token]))
+        elif token.startswith('top') and token[3:].isdigit():
+            n = int(token[3:])
+            if not 0 < n <= len(TOP_PORTS):
+                raise ValueError(f"Invalid port spec: {token} (the ranking covers top1-top{len(TOP_PORTS)};"
+                                 f" use ranges or 'all' beyond that)")
+            ports.update(TOP_PORTS[:n])
+        else:
+            low, _, high = token.partition('-')
+            if not low.isdigit() or (high and not high.isdigit()):
+                raise ValueError(f"Invalid port spec: {token}")
+            low, high = int(low), int(high or low)
+            if not 0 < low <= high < 65536:
+                raise ValueError(f"Invalid port range: {token}")
+            ports.update(range(low, high + 1))
+    if not ports:
+        raise ValueError(f"Empty port spec: {spec!r}")
+    return PortSet(ports, spec)
+
+# --- Async TCP Connect Engine ---
+FILTERED_AFTER = 4
+FILTERED_PORTS = frozenset((21, 22, 23, 25, 53, 80, 110, 135, 139, 143, 443, 445, 993, 995,
+                            1433, 3306, 3389, 5900, 8080, 8443))
+def connect_budget(requested):
+    """Clamps the in-flight connect count to what the fd limit allows."""
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, ValueError, OSError):
+        return requested
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft - 64))
+
+async def _connect_probe(loop, ip, port, timeout):
+    """True if open, False if the host answered with a reset, None if nothing came back."""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.setblocking(False)
+    # RST on close so thousands of probes don't pile up in TIME_WAIT
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+    try:
+        await asyncio.wait_for(loop.sock_connect(s, (ip, port)), timeout)
+        return True
+    except ConnectionRefusedError:
+        return False
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        s.close()
+
+async def _tcp_connect_scan(targets, total, concurrency, timeout, budget, stop, on_open, on_progress,
+                            rtt, on_filtered, metrics, subnet):
+    loop = asyncio.get_running_loop()
+    done = 0
+    # per host: [probes without an answer, answered at all]; FILTERED_AFTER silent probes flag it
+    silence = {}
+    filtered = set()
+
+    async def worker():
+        nonlocal done
+        # all workers share one iterator, so targets are pulled lazily
+        for ip, port in targets:
+            if stop and stop.is_set():
+                return
+            done += 1
+            if on_progress and done % 500 == 0:
+                on_progress(done, total)
+            if ip in filtered and port not in FILTERED_PORTS:
+                continue
+            if budget:
+                delay = budget.reserve()
+                if delay > 0.001:
+                    await asyncio.sleep(delay)
+            seen = silence.setdefault(ip, [0, False])
+            # a host that has not answered yet gets the full timeout, so a slow host is not taken for a filtered one
+            wait = rtt.timeout(timeout) if rtt and seen[1] else timeout
+            started = loop.time()
+            if metrics:
+                metrics.inc('probes_sent', stage='tcp')
+                metrics.inc('inflight', stage='tcp')
+            state = await _connect_probe(loop, ip, port, wait)
+            elapsed = loop.time() - started
+            if state is not None and rtt:
+                rtt.sample(elapsed)
+            if metrics:
+                metrics.inc('inflight', -1, stage='tcp')
+                if state is None:
+                    metrics.inc('timeouts', stage='tcp')
+                else:
+                    metrics.inc('replies', stage='tcp')
+                    metrics.observe('rtt_seconds', elapsed, stage='tcp', subnet=subnet)
+            if state:
+                on_open(ip, port)
+            if state is not None:
+                seen[1] = True
+            elif not seen[1] and wait >= timeout:
+                seen[0] += 1
+                if seen[0] == FILTERED_AFTER:
+                    filtered.add(ip)
+                    if on_filtered:
+                        on_filtered(ip)
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total) or 1)))
+
+def tcp_connect_scan(ips, ports, concurrency=1000, timeout=0.3, budget=None, stop=None,
+                     on_open=None, on_progress=None, rtt=None, on_filtered=None, metrics=None, subnet=''):
+    """
+    Connect-scans every ip/port pair from a single asyncio event loop.
+
+    Targets are walked port-major so consecutive probes hit different hosts,
+    and on_open(ip, port) fires as each connect succeeds rather than in
+    submission order. With an RttEstimator, fed only by these connects, each
+    connect to a host that has answered waits the current adaptive timeout;
+    until then it waits the full timeout. A host whose first
+    FILTERED_AFTER probes all go unanswered is reported to on_filtered(ip)
+    and from then on only probed on FILTERED_PORTS. ports may be a PortSet,
+    whose order is kept, or any iterable of ports. With Metrics, every probe
+    is counted and answers go into the RTT histogram labelled subnet.
+    Returns {ip: OpenPorts}.
+    """
+    ips = list(ips)
+    ports = ports if isinstance(ports, PortSet) else PortSet(ports)
+    found = {}
+
+    def opened(ip, port):
+        found.setdefault(ip, []).append(port)
+        if on_open:
+            on_open(ip, port)
+
+    targets = ((ip, p) for p in ports for ip in ips)
+    asyncio.run(_tcp_connect_scan(targets, len(ips) * len(ports), connect_budget(concurrency),
+                                  timeout, budget, stop, opened, on_progress, rtt, on_filtered, metrics, subnet))
+    return {ip: OpenPorts(found.get(ip, ())) for ip in ips}
+
+# --- Bulk SNMP Engine ---
+SNMP_SYSTEM_OIDS = {
+    'sysDescr': '1.3.6.1.2.1.1.1.0',
+    'sysObjectID': '1.3.6.1.2.1.1.2.0',
+    'sysUpTime': '1.3.6.1.2.1.1.3.0',
+    'sysName': '1.3.6.1.2.1.1.5.0',
+}
+
+def _close_snmp_engine(engine):
+    for close in ('close_dispatcher', 'closeDispatcher'):
+        if hasattr(engine, close):
+            getattr(engine, close)()
+            return
+    dispatcher = getattr(engine, 'transportDispatcher', None)
+    if dispatcher is not None:
+        dispatcher.closeDispatcher()
+
+def _snmp_values(result):
+    error_indication, error_status, _, var_binds = result
+    if error_indication or error_status:
+        return None
+    return {name: str(vb[1]) for name, vb in zip(SNMP_SYSTEM_OIDS, var_binds)}
+
+def _snmp_count(metrics, values, elapsed):
+    if metrics:
+        metrics.inc('inflight', -1, stage='snmp')
+        if values:
+            metrics.inc('replies', stage='snmp')
+            metrics.observe('rtt_seconds', elapsed, stage='snmp')
+        else:
+            metrics.inc('timeouts', stage='snmp')
+
+async def _snmp_bulk(api, get, engine, gate, ips, community, timeout, budget, stop, on_result, metrics):
+    auth = api.CommunityData(community, mpModel=1)
+    context = api.ContextData()
+    objects = [api.ObjectType(api.ObjectIdentity(oid)) for oid in SNMP_SYSTEM_OIDS.values()]
+    results = {}
+
+    async def query(ip):
+        async with gate:
+            if stop and stop.is_set():
+                return
+            if budget:
+                delay = budget.reserve()
+                if delay > 0.001:
+                    await asyncio.sleep(delay)
+            if metrics:
+                metrics.inc('probes_sent', stage='snmp')
+                metrics.inc('inflight', stage='snmp')
+            started = time.monotonic()
+            try:
+                if hasattr(api.UdpTransportTarget, 'create'):
+                    target = await api.UdpTransportTarget.create((ip, 161), timeout=timeout, retries=0)
+                else:
+                    target = api.UdpTransportTarget((ip, 161), timeout=timeout, retries=0)
+                values = _snmp_values(await get(engine, auth, target, context, *objects))
             except Exception:
-                pass
-            if idx % 50 == 0:
-                log(f"     ↪ Port scan progress: {idx}/1023")
+                values = None
+            _snmp_count(metrics, values, time.monotonic() - started)
+            if values:
+                results[ip] = values
+                if on_result:
+                    on_result(ip, values)
+
+    await asyncio.gather(*(query(ip) for ip in ips))
+    return results
 
-    host['ports'] = open_ports
-def snmp_get(ip, oid, community='public'):
+async def _snmp_once(api, get, ips, community, timeout, concurrency, budget, stop, on_result, metrics):
+    engine = api.SnmpEngine()
     try:
-        iterator = getCmd(SnmpEngine(), CommunityData(community),
-                          UdpTransportTarget((ip, 161), timeout=1), ContextData(),
-                          ObjectType(ObjectIdentity(oid)))
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-        if errorIndication or errorStatus:
+        return await _snmp_bulk(api, get, engine, asyncio.Semaphore(concurrency), ips, community, timeout,
+                                budget, stop, on_result, metrics)
+    finally:
+        _close_snmp_engine(engine)
+
+class SnmpSession:
+    """
+    One SnmpEngine on a long-lived event loop thread, for the many small
+    snmp_bulk calls of a scan. Batches from any thread are submitted with
+    run_coroutine_threadsafe and share one gate, so however the hosts are
+    batched up to concurrency of them are in flight together. Only for the
+    asyncio pysnmp API; close() when done.
+    """
+    def __init__(self, concurrency=256):
+        self.api, self.get, _ = snmp_api()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='snmp-loop', daemon=True)
+        self.thread.start()
+        self.engine, self.gate = self._call(self._open(concurrency))
+
+    async def _open(self, concurrency):
+        return self.api.SnmpEngine(), asyncio.Semaphore(concurrency)
+
+    async def _close(self):
+        _close_snmp_engine(self.engine)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def bulk(self, ips, community, timeout, budget=None, stop=None, on_result=None, metrics=None):
+        return self._call(_snmp_bulk(self.api, self.get, self.engine, self.gate, ips, community, timeout,
+                                     budget, stop, on_result, metrics))
+
+    def close(self):
+        try:
+            self._call(self._close())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+
+def _snmp_bulk_sync(api, get, ips, community, timeout, concurrency, budget, stop, on_result, metrics):
+    """Old synchronous pysnmp: same single-PDU query, one engine per worker thread."""
+    local = threading.local()
+    results = {}
+
+    def query(ip):
+        if stop and stop.is_set():
+            return
+        if not hasattr(local, 'engine'):
+            local.engine = api.SnmpEngine()
+        if budget:
+            budget.acquire()
+        if metrics:
+            metrics.inc('probes_sent', stage='snmp')
+            metrics.inc('inflight', stage='snmp')
+        started = time.monotonic()
+        try:
+            values = _snmp_values(next(get(local.engine, api.CommunityData(community, mpModel=1),
+                                           api.UdpTransportTarget((ip, 161), timeout=timeout, retries=0),
+                                           api.ContextData(),
+                                           *[api.ObjectType(api.ObjectIdentity(oid)) for oid in SNMP_SYSTEM_OIDS.values()])))
+        except Exception:
+            values = None
+        _snmp_count(metrics, values, time.monotonic() - started)
+        if values:
+            results[ip] = values
+            if on_result:
+                on_result(ip, values)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(concurrency, 32)) as executor:
+        list(executor.map(query, ips))
+    return results
+
+def snmp_bulk(ips, community='public', timeout=1.0, concurrency=256, budget=None, stop=None, on_result=None,
+              metrics=None, session=None):
+    """
+    Fetches sysDescr, sysObjectID, sysUpTime and sysName from many hosts at
+    once: one SnmpEngine (and so one UDP socket) on one event loop, one v2c
+    GET carrying all four OIDs per host. With a SnmpSession the query runs
+    on its engine and gate (concurrency is then the session's); otherwise
+    an engine is built for this call alone. Returns {ip: {name: value}} for
+    the hosts that answered.
+    """
+    ips = list(ips)
+    if not ips:
+        return {}
+    api, get, is_async = snmp_api()
+    if not is_async:
+        return _snmp_bulk_sync(api, get, ips, community, timeout, concurrency, budget, stop, on_result, metrics)
+    if session:
+        return session.bulk(ips, community, timeout, budget, stop, on_result, metrics)
+    return asyncio.run(_snmp_once(api, get, ips, community, timeout, concurrency, budget, stop, on_result, metrics))
+
+# --- Reverse DNS ---
+class DnsResolver:
+    """
+    Concurrent PTR lookups behind a TTL cache shared by every scan in the
+    process. Names are cached for ttl seconds and failures for negative_ttl,
+    so a rescan does not wait again on addresses that have no PTR record.
+    gethostbyaddr cannot be cancelled: a lookup still running when the
+    caller's timeout expires reports no name now and fills the cache when it
+    finishes.
+    """
+    def __init__(self, workers=64, ttl=3600.0, negative_ttl=300.0, max_entries=65536):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.cache = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ptr')
+
+    @staticmethod
+    def _lookup(ip):
+        try:
+            return socket.gethostbyaddr(ip)[0]
+        except (OSError, UnicodeError):
             return None
-        for varBind in varBinds:
-            return str(varBind[1])
-    except:
+
+    def _store(self, ip, future):
+        name = future.result()
+        with self.lock:
+            self.inflight.pop(ip, None)
+            if len(self.cache) >= self.max_entries:
+                self._evict()
+            self.cache[ip] = (name, time.monotonic() + (self.ttl if name else self.negative_ttl))
+
+    def _evict(self):
+        now = time.monotonic()
+        for ip in [ip for ip, (_, expires) in self.cache.items() if expires <= now]:
+            del self.cache[ip]
+        # still full: drop the oldest quarter, dicts keep insertion order
+        for ip in list(self.cache)[:len(self.cache) - self.max_entries * 3 // 4]:
+            del self.cache[ip]
+
+    def start(self, ips):
+        """Starts lookups for ips without waiting; returns {ip: Future} for collect()."""
+        now = time.monotonic()
+        futures, started = {}, []
+        with self.lock:
+            for ip in ips:
+                if ip in futures:
+                    continue
+                cached = self.cache.get(ip)
+                if cached and cached[1] > now:
+                    futures[ip] = concurrent.futures.Future()
+                    futures[ip].set_result(cached[0])
+                    continue
+                future = self.inflight.get(ip)
+                if future is None:
+                    future = self.inflight[ip] = self.executor.submit(self._lookup, ip)
+                    started.append((ip, future))
+                futures[ip] = future
+        # outside the lock: a lookup that already finished runs _store right here
+        for ip, future in started:
+            future.add_done_callback(lambda f, ip=ip: self._store(ip, f))
+        return futures
+
+    def collect(self, futures, timeout=2.0):
+        """Waits at most timeout seconds overall; returns {ip: name or None}."""
+        concurrent.futures.wait(futures.values(), timeout=timeout)
+        return {ip: f.result() if f.done() else None for ip, f in futures.items()}
+
+    def resolve(self, ips, timeout=2.0):
+        return self.collect(self.start(ips), timeout)
+
+_dns_resolver = None
+_dns_resolver_lock = threading.Lock()
+
+def dns_resolver():
+    """Returns the process-wide resolver, so its cache outlives a single scan."""
+    global _dns_resolver
+    with _dns_resolver_lock:
+        if _dns_resolver is None:
+            _dns_resolver = DnsResolver()
+        return _dns_resolver
+
+# --- Target Specs ---
+Block = namedtuple('Block', 'subnet first last')
+Block.__doc__ = "Addresses first..last (ints) to probe inside the /24 (or smaller) labelled subnet."
+
+TARGET_PROFILES = {
+    'rfc1918': '10.0.0.0/8, 172.16.0.0/12, 192.168.0.0/16',
+    'sweep': '10.0.1.0-10.0.254.255, 192.168.0.0/16, ' + ', '.join(f'172.{i}.0.0/24' for i in range(16, 32)),
+    'quick': '10.0.0.0-10.0.254.255, 192.168.0.0-192.168.254.255, '
+             + ', '.join(f'172.{i}.0.0-172.{i}.254.255' for i in range(16, 32)),
+}
+
+def as_block(subnet):
+    if isinstance(subnet, Block):
+        return subnet
+    first, last = host_bounds(ipaddress.IPv4Network(subnet, strict=False))
+    return Block(subnet, first, last)
+
+class TargetSpec:
+    """
+    A target expression compiled to sorted, disjoint integer intervals.
+
+    Expressions are comma- or space-separated IPs, CIDRs, ranges and
+    profile names (see TARGET_PROFILES); a leading "!" excludes, and
+    ranged is set when an included token is a range. Nothing is
+    materialised: blocks() walks the intervals lazily one /24 at a time,
+    and len() and block_count() are arithmetic, so even all of RFC1918
+    starts instantly in constant memory.
+    """
+    def __init__(self, intervals):
+        merged = []
+        for lo, hi in sorted(intervals):
+            if merged and lo <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+            else:
+                merged.append((lo, hi))
+        self.intervals = merged
+        self.starts = [lo for lo, _ in merged]
+        self.ranged = False
+
+    @classmethod
+    def parse(cls, expr):
+        """Raises ValueError for anything that is not a valid target."""
+        include, exclude, ranged = [], [], False
+        expr = '-'.join(part.strip() for part in expr.split('-'))
+        for token in expr.replace(',', ' ').split():
+            negate = token.startswith('!')
+            token = token.lstrip('!')
+            if token.lower() in TARGET_PROFILES:
+                intervals = cls.parse(TARGET_PROFILES[token.lower()]).intervals
+            else:
+                intervals = [cls._interval(token)]
+                ranged = ranged or ('-' in token and not negate)
+            (exclude if negate else include).extend(intervals)
+        if not include:
+            raise ValueError("Invalid IP, CIDR, or Range")
+        spec = cls(include).minus(exclude)
+        spec.ranged = ranged
+        return spec
+
+    @staticmethod
+    def _interval(token):
+        try:
+            if '-' in token:
+                # "start-end" covers start's network through end's network; a bare
+                # address ending in .0 stands for its /24, as in "10.0.0.0-10.255.0.0"
+                ends = []
+                for part in token.split('-', 1):
+                    if '/' not in part and part.endswith('.0'):
+                        part += '/24'
+                    ends.append(ipaddress.IPv4Network(part, strict=False))
+                lo, hi = int(ends[0].network_address), int(ends[1].broadcast_address)
+            elif '/' in token:
+                net = ipaddress.IPv4Network(token, strict=False)
+                lo, hi = int(net.network_address), int(net.broadcast_address)
+            else:
+                lo = hi = int(ipaddress.IPv4Address(token))
+        except ValueError:
+            raise ValueError("Invalid IP, CIDR, or Range")
+        if lo > hi:
+            raise ValueError(f"Empty range: {token}")
+        return lo, hi
+
+    def minus(self, intervals):
+        remaining = list(self.intervals)
+        for xlo, xhi in intervals:
+            kept = []
+            for lo, hi in remaining:
+                if hi < xlo or lo > xhi:
+                    kept.append((lo, hi))
+                    continue
+                if lo < xlo:
+                    kept.append((lo, xlo - 1))
+                if hi > xhi:
+                    kept.append((xhi + 1, hi))
+            remaining = kept
+        return TargetSpec(remaining)
+
+    def __len__(self):
+        return sum(hi - lo + 1 for lo, hi in self.intervals)
+
+    def __contains__(self, addr):
+        i = bisect.bisect_right(self.starts, addr) - 1
+        return i >= 0 and addr <= self.intervals[i][1]
+
+    def block_count(self):
+        return sum((hi >> 8) - (lo >> 8) + 1 for lo, hi in self.intervals)
+
+    def blocks(self):
+        """
+        Yields one Block per /24 the spec touches. The network and broadcast
+        address of each /24 are skipped unless they were asked for alone.
+        """
+        for lo, hi in self.intervals:
+            for net in range(lo & ~0xff, hi + 1, 256):
+                first, last = max(lo, net), min(hi, net + 255)
+                if max(first, net + 1) <= min(last, net + 254):
+                    first, last = max(first, net + 1), min(last, net + 254)
+                yield Block(f"{int_to_ip(net)}/24", first, last)
+
+    def shard(self, index, count):
+        """
+        The index-th of count contiguous parts, cut on /24 boundaries so each
+        gets the same number of blocks give or take one.
+        """
+        total = self.block_count()
+        start, stop = index * total // count, (index + 1) * total // count
+        picked, seen = [], 0
+        for lo, hi in self.intervals:
+            n = (hi >> 8) - (lo >> 8) + 1
+            a, b = max(start, seen), min(stop, seen + n)
+            if a < b:
+                first = lo if a == seen else ((lo >> 8) + a - seen) << 8
+                last = hi if b == seen + n else (((lo >> 8) + b - seen) << 8) - 1
+                picked.append((first, last))
+            seen += n
+        return TargetSpec(picked)
+
+    def chunks(self, size):
+        """blocks() in lists of at most size."""
+        blocks = self.blocks()
+        while True:
+            chunk = list(itertools.islice(blocks, size))
+            if not chunk:
+                return
+            yield chunk
+
+# --- Batched Transmit ---
+SEND_BATCH = 64
+_mmsg = None
+
+def sendmmsg_api():
+    """(ctypes, sendmmsg, iovec, msghdr, mmsghdr) from libc, or None where there is no sendmmsg."""
+    global _mmsg
+    if _mmsg is None:
+        _mmsg = False
+        if sys.platform.startswith('linux'):
+            try:
+                import ctypes
+                libc = ctypes.CDLL(None, use_errno=True)
+                sendmmsg = libc.sendmmsg
+            except (OSError, AttributeError):
+                return None
+
+            class iovec(ctypes.Structure):
+                _fields_ = [('base', ctypes.c_void_p), ('len', ctypes.c_size_t)]
+
+            class msghdr(ctypes.Structure):
+                _fields_ = [('name', ctypes.c_void_p), ('namelen', ctypes.c_uint32),
+                            ('iov', ctypes.POINTER(iovec)), ('iovlen', ctypes.c_size_t),
+                            ('control', ctypes.c_void_p), ('controllen', ctypes.c_size_t), ('flags', ctypes.c_int)]
+
+            class mmsghdr(ctypes.Structure):
+                _fields_ = [('hdr', msghdr), ('len', ctypes.c_uint)]
+
+            sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+            sendmmsg.restype = ctypes.c_int
+            _mmsg = (ctypes, sendmmsg, iovec, msghdr, mmsghdr)
+    return _mmsg or None
+
+def packet_socket(iface):
+    """A raw AF_PACKET socket bound to iface for sending whole frames, or None where there is none."""
+    if not hasattr(socket, 'AF_PACKET'):
         return None
+    try:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+        sock.bind((iface, 0))
+        return sock
+    except OSError:
+        return None
+
+class BatchSender:
+    """
+    Sends prebuilt packets `batch` at a time.
+
+    Each slot holds its own copy of the template; callers patch only what
+    changes per probe (slot(ip) fills in the destination address for
+    addressed sockets) and flush() hands the filled slots to the kernel in
+    one sendmmsg call on Linux, or one send per packet elsewhere or when
+    sock is not a plain socket (a scapy L2 socket, say). Full socket
+    buffers are retried and counted as retries in metrics.
+    """
+    def __init__(self, sock, template, addressed=True, batch=SEND_BATCH, metrics=None, stage=''):
+        self.sock = sock
+        self.addressed = addressed
+        self.batch = batch
+        self.metrics = metrics
+        self.stage = stage
+        self.count = 0
+        self.size = len(template)
+        self.slots = [bytearray(template) for _ in range(batch)]
+        self.views = [memoryview(s) for s in self.slots]
+        self.dests = [None] * batch
+        self.api = sendmmsg_api() if isinstance(sock, socket.socket) else None
+        if self.api:
+            self._build_headers()
+
+    def _build_headers(self):
+        ctypes, _, iovec, _, mmsghdr = self.api
+        # sockaddr_in: family (native order), port, address, padding
+        self.addrs = [bytearray(struct.pack('=H', socket.AF_INET) + bytes(14)) for _ in range(self.batch)]
+        self.iovs = (iovec * self.batch)()
+        self.msgs = (mmsghdr * self.batch)()
+        self.entry = ctypes.sizeof(mmsghdr)
+        self.buffers = [(ctypes.c_char * self.size).from_buffer(s) for s in self.slots]
+        # kept on self: the headers point into these buffers
+        self.names = [(ctypes.c_char * 16).from_buffer(a) for a in self.addrs]
+        for i in range(self.batch):
+            self.iovs[i].base = ctypes.addressof(self.buffers[i])
+            self.iovs[i].len = self.size
+            hdr = self.msgs[i].hdr
+            hdr.iov = ctypes.pointer(self.iovs[i])
+            hdr.iovlen = 1
+            if self.addressed:
+                hdr.name = ctypes.addressof(self.names[i])
+                hdr.namelen = 16
+
+    def load(self, template):
+        """Flushes what is queued and makes template (same length) the packet every slot starts from."""
+        if len(template) != self.size:
+            raise ValueError(f"template is {len(template)} bytes, slots hold {self.size}")
+        failed = self.flush()
+        for slot in self.slots:
+            slot[:] = template
+        return failed
+
+    def slot(self, ip=None):
+        """The next free slot as a writable view, already addressed to ip (a dotted string)."""
+        i = self.count
+        self.count += 1
+        if self.addressed:
+            if self.api:
+                self.addrs[i][4:8] = socket.inet_aton(ip)
+            self.dests[i] = ip
+        return self.views[i]
+
+    @property
+    def full(self):
+        return self.count >= self.batch
+
+    def _retry(self, attempt):
+        if self.metrics:
+            self.metrics.inc('retries', stage=self.stage)
+        time.sleep(0.001 * min(attempt, 10))
+
+    def flush(self):
+        """Sends every filled slot; returns the indexes of the ones the kernel refused."""
+        count, self.count = self.count, 0
+        if not count:
+            return []
+        if self.api:
+            return self._flush_mmsg(count)
+        failed = []
+        for i in range(count):
+            packet = self.views[i][:self.size]
+            for attempt in range(1, 4):
+                try:
+                    if self.addressed:
+                        self.sock.sendto(packet, (self.dests[i], 0))
+                    else:
+                        self.sock.send(bytes(packet))
+                    break
+                except OSError as e:
+                    if e.errno not in (errno.ENOBUFS, errno.EAGAIN, errno.EWOULDBLOCK) or attempt == 3:
+                        failed.append(i)
+                        break
+                    self._retry(attempt)
+        return failed
+
+    def _flush_mmsg(self, count):
+        ctypes, sendmmsg = self.api[0], self.api[1]
+        fd, base, failed = self.sock.fileno(), ctypes.addressof(self.msgs), []
+        done, stalls = 0, 0
+        while done < count:
+            sent = sendmmsg(fd, base + done * self.entry, count - done, 0)
+            if sent > 0:
+                done += sent
+                stalls = 0
+                continue
+            err = ctypes.get_errno()
+            if err in (errno.ENOBUFS, errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR) and stalls < 50:
+                stalls += 1
+                self._retry(stalls)
+                continue
+            # the first remaining packet is refused (unreachable, say): drop it and go on
+            failed.append(done)
+            done += 1
+            stalls = 0
+        return failed
+
+# --- ARP ---
+ETH_P_ARP = 0x0806
+ARP_RCVBUF = 8 << 20
+
+def arp_listener(ifaces):
+    """
+    Non-blocking packet sockets that only receive ARP, one per interface,
+    or None where there are none (not Linux, or not privileged).
+    """
+    if not hasattr(socket, 'AF_PACKET'):
+        return None
+    socks = []
+    try:
+        for iface in ifaces:
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+            socks.append(sock)
+            sock.bind((iface, ETH_P_ARP))
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, ARP_RCVBUF)
+                sock.setsockopt(socket.SOL_SOCKET, getattr(socket, 'SO_RCVBUFFORCE', 33), ARP_RCVBUF)
+            except OSError:
+                pass
+            sock.setblocking(False)
+    except OSError:
+        for sock in socks:
+            sock.close()
+        return None
+    return socks
+
+def _arp_receive(socks, on_reply, done, metrics=None):
+    """
+    Reads ARP replies off socks until done is set, then drains what is
+    queued and closes them. Frames are parsed in place with struct, our own
+    outgoing requests are skipped, and PACKET_STATISTICS drops are added to
+    metrics as they happen.
+    """
+    outgoing = getattr(socket, 'PACKET_OUTGOING', 4)
+
+    def drain(sock):
+        while True:
+            try:
+                data, addr = sock.recvfrom(128)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if addr[2] == outgoing or len(data) < 42:
+                continue
+            ethertype, op = struct.unpack_from('!H6xH', data, 12)
+            if ethertype != ETH_P_ARP or op != 2:
+                continue
+            on_reply(struct.unpack_from('!I', data, 28)[0], ':'.join(f"{b:02x}" for b in data[22:28]))
+
+    def count_drops():
+        if not metrics:
+            return
+        for sock in socks:
+            try:
+                # struct tpacket_stats {packets, drops}; reading resets it
+                _, drops = struct.unpack('II', sock.getsockopt(263, 6, 8))
+            except OSError:
+                continue
+            if drops:
+                metrics.inc('drops', drops, stage='arp')
 
-def arp_scan(subnet):
-    log(f"🔍 ARP scanning: {subnet}")
-    ether = Ether(dst="ff:ff:ff:ff:ff:ff")
-    arp = ARP(pdst=subnet)
-    packet = ether / arp
-    result = srp(packet, timeout=2, verbose=0)[0]
-    hosts = {}
-    for _, rcv in result:
-        ip = rcv.psrc
-        mac = rcv.hwsrc
-        hostname = ip
-        hosts[ip] = {"ip": ip, "mac": mac, "hostname": hostname, "subnet": subnet, "ports": [], "os": ""}
-    log(f"✅ ARP found {len(hosts)} host(s) in {subnet}")
-    return hosts
-
-def enrich_host_snmp(host):
-    import socket
-    ip = host['ip']
-    log(f"   ↪ SNMP enrichment for {ip}...")
-    os_info = snmp_get(ip, '1.3.6.1.2.1.1.1.0')
-    if os_info:
-        log(f"   ↪ OS Info: {os_info}")
-        host['os'] = os_info
+    try:
+        checked = time.monotonic()
+        while not done.is_set():
+            ready, _, _ = select.select(socks, [], [], 0.1)
+            for sock in ready:
+                drain(sock)
+            if time.monotonic() - checked >= 0.25:
+                count_drops()
+                checked = time.monotonic()
+        for sock in socks:
+            drain(sock)
+        count_drops()
+    finally:
+        for sock in socks:
+            sock.close()
+
+
+def host_bounds(net):
+    """Returns the first and last usable host address of a network as ints."""
+    first, last = int(net.network_address), int(net.broadcast_address)
+    if net.prefixlen < 31:
+        first, last = first + 1, last - 1
+    return first, last
+
+def arp_sweep(subnets, timeout=2, budget=None, stop=None, on_reply=None, rtt=None, metrics=None):
+    """
+    ARP-discovers many subnets (CIDR strings or Blocks) in a single pass.
+
+    Requests for every target are patched into one frame per subnet and sent
+    in batches through one packet socket per interface (scapy's L2 socket
+    where there is none) while one background thread reads replies off
+    ARP-only packet sockets (scapy's sniffer where there are none); they
+    are attributed to their subnet by address. Wall time is the send time plus
+    one timeout, however many subnets are swept. With an RttTable, replies
+    feed the estimators of their subnet and interface, and the trailing wait
+    shrinks to the slowest interface's adaptive timeout. With Metrics, sends
+    are counted per batch and replies land in their subnet's RTT histogram.
+    Returns {subnet: hosts}.
+    """
+    ARP, Ether, AsyncSniffer, raw, conf = scapy_l2()
+    stopped = stop.is_set if stop else (lambda: False)
+    blocks = sorted((as_block(s) for s in subnets), key=lambda b: b.first)
+    starts = [b.first for b in blocks]
+    ends = [b.last for b in blocks]
+    results = {b.subnet: {} for b in blocks}
+    routes = [conf.route.route(int_to_ip(b.first)) for b in blocks]
+    sent_at = {}
+    timed = bool(rtt or metrics)
+    counts = [0, 0]  # sent, answered
+
+    def handle(addr, mac):
+        i = bisect.bisect_right(starts, addr) - 1
+        if i < 0 or addr > ends[i]:
+            return
+        hosts = results[blocks[i].subnet]
+        if addr in hosts:
+            return
+        hosts[addr] = HostRecord(addr, blocks[i].subnet, mac=mac)
+        if timed and addr in sent_at:
+            elapsed = time.monotonic() - sent_at[addr]
+            if rtt:
+                rtt.get(blocks[i].subnet).sample(elapsed)
+                rtt.get(routes[i][0]).sample(elapsed)
+            if metrics:
+                counts[1] += 1
+                metrics.inc('replies', stage='arp')
+                metrics.inc('inflight', -1, stage='arp')
+                metrics.observe('rtt_seconds', elapsed, stage='arp', subnet=blocks[i].subnet)
+        if on_reply:
+            on_reply(hosts[addr])
+
+    def flush(sender, batch):
+        if budget:
+            budget.acquire(len(batch))
+        if timed:
+            now = time.monotonic()
+            for ip in batch:
+                sent_at[ip] = now
+        if metrics:
+            # counted per batch, so the rate controller sees sends as they leave
+            metrics.inc('probes_sent', len(batch), stage='arp')
+            metrics.inc('inflight', len(batch), stage='arp')
+        failed = sender.flush()
+        for i in failed:
+            sent_at.pop(batch[i], None)
+        if metrics and failed:
+            metrics.inc('probes_sent', -len(failed), stage='arp')
+            metrics.inc('inflight', -len(failed), stage='arp')
+        sent = len(batch) - len(failed)
+        batch.clear()
+        return sent
+
+    ifaces = sorted({r[0] for r in routes}) or [conf.iface]
+    socks = arp_listener(ifaces)
+    if socks is not None:
+        done = threading.Event()
+        receiver = threading.Thread(target=_arp_receive, args=(socks, handle, done, metrics), name='arp-receive', daemon=True)
+        receiver.start()
     else:
-        log(f"   ↪ No SNMP OS info for {ip}")
+        ready = threading.Event()
+        sniffer = AsyncSniffer(iface=ifaces if len(ifaces) > 1 else ifaces[0], store=False,
+                               prn=lambda p: handle(int(ipaddress.IPv4Address(p[ARP].psrc)), p[ARP].hwsrc),
+                               lfilter=lambda p: ARP in p and p[ARP].op == 2, started_callback=ready.set)
+        sniffer.start()
+        ready.wait(timeout)
+    senders = {}
     try:
-        hostname = socket.gethostbyaddr(ip)[0]
-        log(f"   ↪ Hostname resolved: {hostname}")
-        host['hostname'] = hostname
-    except:
-        pass
-    enrich_host_ports(host)
-
-# --- Core Scan Wrapper ---
-def icmp_ping(ip):
-    from scapy.all import IP, ICMP, sr1
+        for (_, first, last), (iface, _, _) in zip(blocks, routes):
+            if stopped():
+                break
+            # build one frame per subnet and only patch the target address per request
+            frame = raw(Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=int_to_ip(first)))
+            sender = senders.get(iface)
+            if sender is None:
+                sock = packet_socket(iface) or conf.L2socket(iface=iface)
+                sender = senders[iface] = BatchSender(sock, frame, addressed=False, metrics=metrics, stage='arp')
+            else:
+                sender.load(frame)
+            sent, batch = 0, []
+            for ip in range(first, last + 1):
+                if stopped():
+                    break
+                struct.pack_into('!I', sender.slot(), 38, ip)
+                batch.append(ip)
+                if sender.full:
+                    sent += flush(sender, batch)
+            if batch and not stopped():
+                sent += flush(sender, batch)
+            counts[0] += sent
+        if not stopped():
+            time.sleep(max(rtt.get(iface).timeout(timeout) for iface in ifaces) if rtt else timeout)
+    finally:
+        if socks is not None:
+            done.set()
+            receiver.join()
+        else:
+            sniffer.stop()
+        for sender in senders.values():
+            sender.sock.close()
+        if metrics:
+            unanswered = max(0, counts[0] - counts[1])
+            metrics.inc('timeouts', unanswered, stage='arp')
+            metrics.inc('inflight', -unanswered, stage='arp')
+    return results
+
+# --- ICMP Sweep Engine ---
+ICMP_PAYLOAD = b'LANLord-sweep\0\0\0'
+ICMP_FALLBACK_THREADS = 32
+ICMP_RCVBUF = 32 << 20
+
+def inet_checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def echo_template(ident):
+    """
+    An echo request with sequence 0 and a zero checksum, plus the one's
+    complement sum of everything but the sequence, so a probe's checksum is
+    a single add and fold instead of a pass over the whole packet.
+    """
+    packet = struct.pack('!BBHHH', 8, 0, 0, ident, 0) + ICMP_PAYLOAD
+    return packet, (~inet_checksum(packet)) & 0xffff
+
+def echo_checksum(partial, seq):
+    total = partial + seq
+    total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+class IcmpJob:
+    """Responders of one sweep; filled in by the shared receiver thread."""
+    def __init__(self, on_reply=None, rtt=None, metrics=None, subnet=''):
+        self.responders = set()
+        self.on_reply = on_reply
+        self.rtt = rtt
+        self.metrics = metrics
+        self.subnet = subnet
+        self.sent = 0
+        self.sending = True
+        self.complete = threading.Event()
+
+    def reply(self, ip, elapsed):
+        self.responders.add(ip)
+        if self.rtt:
+            self.rtt.sample(elapsed)
+        if self.metrics:
+            self.metrics.inc('replies', stage='icmp')
+            self.metrics.inc('inflight', -1, stage='icmp')
+            self.metrics.observe('rtt_seconds', elapsed, stage='icmp', subnet=self.subnet)
+        if self.on_reply:
+            self.on_reply(ip)
+
+class IcmpSweeper:
+    """
+    Echo sweeper built on one shared ICMP socket.
+
+    Any thread can call sweep() and acts as the sender; a single receiver
+    thread matches echo replies to outstanding probes by identifier,
+    sequence number and source address. Uses a raw socket when privileged
+    and an unprivileged ping socket (Linux) otherwise, where the kernel owns
+    the identifier and filters replies per socket. Probes are patched into
+    a precompiled echo template and leave in BatchSender batches. If the
+    receiver thread fails, error says why and every waiting sweep is
+    released; icmp_engine() then stops handing the sweeper out.
+    """
+    def __init__(self):
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self.raw = True
+        except PermissionError:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self.raw = False
+        # Windows refuses recvfrom on an unbound raw socket (WSAEINVAL)
+        self.sock.bind(('0.0.0.0', 0))
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+            # privileged: past net.core.rmem_max, deep enough to absorb the reply burst of a full batch run
+            self.sock.setsockopt(socket.SOL_SOCKET, getattr(socket, 'SO_RCVBUFFORCE', 33), ICMP_RCVBUF)
+        except OSError:
+            pass
+        if self.raw and sys.platform.startswith('linux'):
+            # ICMP_FILTER: let only echo replies through, so batched requests looping back
+            # (or other ICMP noise) cannot crowd replies out of the receive buffer
+            try:
+                self.sock.setsockopt(255, 1, struct.pack('=I', 0xffffffff & ~1))
+            except OSError:
+                pass
+        self.sock.settimeout(0.5)
+        self.ident = os.getpid() & 0xffff
+        self.template, self.partial = echo_template(self.ident)
+        self.seq = 0
+        # (ip, seq) -> (job, sent): keyed by address too, so a wrapped sequence number cannot steal a reply
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.error = None
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                with self.lock:
+                    self.error = e
+                    jobs = {job for job, _ in self.pending.values()}
+                for job in jobs:
+                    job.complete.set()
+                return
+            if self.raw:
+                data = data[(data[0] & 0x0f) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack_from('!BBHHH', data)
+            if icmp_type != 0 or (self.raw and ident != self.ident):
+                continue
+            with self.lock:
+                entry = self.pending.pop((addr[0], seq), None)
+            if entry is None:
+                continue
+            job, sent = entry
+            job.reply(addr[0], time.monotonic() - sent)
+            if not job.sending and len(job.responders) >= job.sent:
+                job.complete.set()
+
+    def sweep(self, ips, timeout=1.0, budget=None, stop=None, on_reply=None, rtt=None, metrics=None, subnet=''):
+        """
+        Sends one echo request per address (paced by budget if given), then
+        waits one timeout for stragglers. With an RttEstimator, replies feed
+        it and the trailing wait is its adaptive timeout instead. With
+        Metrics, probes are counted and replies go into the RTT histogram
+        labelled subnet. Returns the set of responders.
+        """
+        stopped = stop.is_set if stop else (lambda: False)
+        job = IcmpJob(on_reply, rtt, metrics, subnet)
+        sender = BatchSender(self.sock, self.template, metrics=metrics, stage='icmp')
+        batch, keys = [], []
+
+        def flush():
+            n = len(batch)
+            if budget:
+                budget.acquire(n)
+            # sequence numbers are handed out per batch, under one lock round trip
+            now = time.monotonic()
+            with self.lock:
+                first = self.seq + 1
+                self.seq = (self.seq + n) & 0xffff
+                sent = [(ip, (first + i) & 0xffff) for i, ip in enumerate(batch)]
+                for key in sent:
+                    self.pending[key] = (job, now)
+            for i, (_, seq) in enumerate(sent):
+                struct.pack_into('!H', sender.views[i], 2, echo_checksum(self.partial, seq))
+                struct.pack_into('!H', sender.views[i], 6, seq)
+            keys.extend(sent)
+            if metrics:
+                metrics.inc('probes_sent', n, stage='icmp')
+                metrics.inc('inflight', n, stage='icmp')
+            failed = sender.flush()
+            if failed:
+                with self.lock:
+                    for i in failed:
+                        self.pending.pop(sent[i], None)
+                if metrics:
+                    metrics.inc('probes_sent', -len(failed), stage='icmp')
+                    metrics.inc('inflight', -len(failed), stage='icmp')
+            job.sent += n - len(failed)
+            batch.clear()
+
+        try:
+            for ip in ips:
+                if stopped():
+                    break
+                ip = str(ip)
+                sender.slot(ip)
+                batch.append(ip)
+                if sender.full:
+                    flush()
+            if batch and not stopped():
+                flush()
+            job.sending = False
+            if job.sent and len(job.responders) < job.sent and not stopped():
+                # batches leave faster than the receiver drains replies: keep re-arming the
+                # adaptive wait while replies still arrive, up to the configured timeout
+                deadline, seen = time.monotonic() + timeout, -1
+                while seen < len(job.responders) and not stopped() and not self.error:
+                    seen = len(job.responders)
+                    wait = min(rtt.timeout(timeout) if rtt else timeout, deadline - time.monotonic())
+                    if wait <= 0 or job.complete.wait(wait):
+                        break
+        finally:
+            with self.lock:
+                expired = 0
+                for key in keys:
+                    entry = self.pending.get(key)
+                    if entry is not None and entry[0] is job:
+                        del self.pending[key]
+                        expired += 1
+            if metrics and expired:
+                metrics.inc('timeouts', expired, stage='icmp')
+                metrics.inc('inflight', -expired, stage='icmp')
+        return set(job.responders)
+
+_icmp_engine = None
+_icmp_engine_lock = threading.Lock()
+
+def icmp_engine(log=_no_log):
+    """Returns the shared sweeper, or None when no ICMP socket can be opened or its receiver has failed."""
+    global _icmp_engine
+    with _icmp_engine_lock:
+        if _icmp_engine is None:
+            try:
+                _icmp_engine = IcmpSweeper()
+            except OSError as e:
+                log(f"⚠️ ICMP socket unavailable ({e}), falling back to scapy pings")
+                _icmp_engine = False
+        elif _icmp_engine and _icmp_engine.error:
+            log(f"⚠️ ICMP receiver failed ({_icmp_engine.error}), falling back to scapy pings")
+            _icmp_engine.sock.close()
+            _icmp_engine = False
+        return _icmp_engine or None
+
+def scapy_icmp_ping(ip, timeout=1):
     import logging
     logging.getLogger("scapy.runtime").setLevel(logging.ERROR)
+    inet = lazy_import('scapy.layers.inet')
+    IP, ICMP, sr1 = inet.IP, inet.ICMP, lazy_import('scapy.sendrecv').sr1
     pkt = IP(dst=ip)/ICMP()
-    resp = sr1(pkt, timeout=1, verbose=0)
+    resp = sr1(pkt, timeout=timeout, verbose=0)
     return resp is not None and resp.haslayer(ICMP) and resp[ICMP].type == 0
 
-def basic_scan(subnet):
-    global loot
-    if stop_flag:
-        return
-    try:
-        hosts = arp_scan(subnet)
-        scanned = set(hosts.keys())
-        if is_deep_scan:
-            log(f"🔁 Deep Scan: ICMP sweeping {subnet} with up to {thread_limit.get()} threads...")
-            net = ipaddress.IPv4Network(subnet, strict=False)
-            threaded_icmp_sweep(list(net.hosts()), scanned, hosts, subnet)
-        for h in hosts.values():
-            if is_deep_scan:
-                enrich_host_snmp(h)
-            loot.append(h)
-    except Exception as e:
-        log(f"⚠️ Scan failed: {e}")
-    except Exception as e:
-        log(f"⚠️ Scan failed: {e}")
-
-# --- Scan Types ---
-def run_full_sweep():
-    global stop_flag, loot
-    stop_flag = False
-    loot.clear()
-    ranges = [f"10.0.{i}.0/24" for i in range(1, 255)] + \
-             [f"172.{i}.0.0/24" for i in range(16, 32)] + \
-             [f"192.168.{i}.0/24" for i in range(256)]
-    for idx, subnet in enumerate(ranges, 1):
-        if stop_flag:
-            log(f"⛔ Sweep aborted at {idx}/{len(ranges)}")
-            return
-        log(f"🌐 [{idx}/{len(ranges)}] {subnet}")
-        basic_scan(subnet)
-    log(f"🎉 Sweep complete: {len(loot)} hosts")
+def threaded_icmp_ping(ip_list, stop=None, log=_no_log):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=ICMP_FALLBACK_THREADS) as executor:
+        futures = {executor.submit(scapy_icmp_ping, ip): ip for ip in ip_list}
+        responders = set()
+        for future, ip in futures.items():
+            if stop and stop.is_set():
+                break
+            try:
+                if future.result():
+                    responders.add(ip)
+            except Exception as e:
+                log(f"   ↪ Error pinging {ip}: {e}")
+        return responders
 
-def run_quick():
-    global stop_flag, loot
-    stop_flag = False
-    loot.clear()
+# --- Subnet Liveness ---
+def gateway_candidates(subnet):
+    """First and last usable host, where gateways usually sit (.1 and .254 on a /24)."""
+    first, last = host_bounds(ipaddress.IPv4Network(subnet, strict=False))
+    return [str(ipaddress.IPv4Address(first))] + ([str(ipaddress.IPv4Address(last))] if last != first else [])
 
-    subnets = []
+def probe_subnets(subnets, timeout=1.0, budget=None, stop=None, on_alive=None, log=_no_log, metrics=None):
+    """
+    Finds which subnets answer on a gateway address, all in one ICMP sweep.
 
-    # Add 10.0.0.0/24 through 10.0.254.0/24
-    subnets += [f"10.0.{i}.0/24" for i in range(255)]
+    The first candidate of every subnet goes out first; the second one is
+    only sent for subnets that have not answered by the time the sender gets
+    to it, so a live subnet costs one probe and a dead one two. Returns the
+    set of live subnets after a single trailing timeout.
+    """
+    owner = {}
+    plan = []
+    for subnet in subnets:
+        for rank, ip in enumerate(gateway_candidates(subnet)):
+            owner[ip] = subnet
+            plan.append((rank, ip))
+    plan.sort(key=lambda item: item[0])
+    live = set()
 
-    # Add 172.16.0.0/24 through 172.31.254.0/24
-    for i in range(16, 32):  # 172.16 - 172.31
-        subnets += [f"172.{i}.{j}.0/24" for j in range(255)]
+    def answered(ip):
+        subnet = owner[ip]
+        if subnet not in live:
+            live.add(subnet)
+            if on_alive:
+                on_alive(subnet)
 
-    # Add 192.168.0.0/24 through 192.168.254.0/24
-    subnets += [f"192.168.{i}.0/24" for i in range(255)]
+    engine = icmp_engine(log)
+    if engine is None:
+        for ip in threaded_icmp_ping([ip for _, ip in plan], stop, log):
+            answered(ip)
+        return live
+    targets = (ip for _, ip in plan if owner[ip] not in live)
+    engine.sweep(targets, timeout=timeout, budget=budget, stop=stop, on_reply=answered, metrics=metrics)
+    return live
 
-    for idx, net in enumerate(subnets, 1):
-        if stop_flag:
-            log(f"⛔ Quick scan aborted at {idx}/{len(subnets)}")
-            return
-        log(f"🔎 [{idx}/{len(subnets)}] {net}")
-        basic_scan(net)
+# --- Stage Pipeline ---
+_DONE = object()
 
-    log(f"✅ Quick scan complete: {len(loot)} hosts")
+class StagePipeline:
+    """
+    Carries hosts through enrichment stages joined by bounded queues.
 
-def run_manual(target):
-    global stop_flag, loot
-    stop_flag = False
-    loot.clear()
-    try:
-        if '-' in target:
-            start_subnet, end_subnet = target.replace(' ', '').split('-')
-            start_ip = ipaddress.IPv4Network(start_subnet, strict=False).network_address
-            end_ip = ipaddress.IPv4Network(end_subnet, strict=False).network_address
-            current = int(start_ip)
-            end = int(end_ip)
-            alive_subnets = []
-            while current <= end:
-                subnet = ipaddress.IPv4Network((ipaddress.IPv4Address(current), 24), strict=False)
-                ip1 = str(subnet.network_address + 1)
-                ip254 = str(subnet.network_address + 254)
-                log(f"🌐 Checking {subnet} for gateway response...")
-                resp1 = icmp_ping(ip1)
-                resp254 = icmp_ping(ip254)
-                if resp1 or resp254:
-                    log(f"✅ Subnet {subnet} is alive")
-                    alive_subnets.append(str(subnet))
+    stages is a list of (name, fn, workers). Each worker takes a micro-batch
+    of up to `batch` hosts (waiting at most `linger` seconds to fill it),
+    calls fn(batch) and passes on the hosts fn returns, or all of them if it
+    returns None. A full queue holds back the stage before it. Hosts that
+    leave the pipeline go to sink(host, completed), where completed is False
+    for hosts a stage chose not to pass on.
+
+    offer() never blocks, so sniffer and receiver threads can feed it
+    directly; a feeder thread moves offered hosts into the first queue.
+    With Metrics, each stage's busy time, host count and queue depth are kept.
+    """
+    def __init__(self, stages, sink, batch=64, depth=1024, linger=0.02, log=_no_log, metrics=None):
+        self.stages = stages
+        self.sink = sink
+        self.metrics = metrics
+        self.batch = batch
+        self.linger = linger
+        self.log = log
+        self.inbox = queue.SimpleQueue()
+        self.queues = [queue.Queue(depth) for _ in stages]
+        self.running = [workers for _, _, workers in stages]
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._feed, daemon=True)]
+        for i, (name, _, workers) in enumerate(stages):
+            self.threads += [threading.Thread(target=self._work, args=(i,), name=f'stage-{name}', daemon=True)
+                             for _ in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def offer(self, host):
+        self.inbox.put(host)
+
+    def close(self):
+        """Marks the end of input and waits until every stage has drained."""
+        self.inbox.put(_DONE)
+        for t in self.threads:
+            t.join()
+
+    def _finish(self, host, completed):
+        try:
+            self.sink(host, completed)
+        except Exception as e:
+            self.log(f"⚠️ Could not record {host.ip}: {e}")
+
+    def _forward(self, i, host):
+        if i < len(self.queues):
+            self.queues[i].put(host)
+        else:
+            self._finish(host, True)
+
+    def _end(self, i):
+        """Passes end-of-input on to stage i, one marker per worker."""
+        if i < len(self.queues):
+            for _ in range(self.stages[i][2]):
+                self.queues[i].put(_DONE)
+
+    def _feed(self):
+        while True:
+            host = self.inbox.get()
+            if host is _DONE:
+                self._end(0)
+                return
+            self._forward(0, host)
+
+    def _take(self, q):
+        item = q.get()
+        if item is _DONE:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch:
+            try:
+                item = q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _DONE:
+                q.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _work(self, i):
+        name, fn, _ = self.stages[i]
+        while True:
+            batch = self._take(self.queues[i])
+            if batch is None:
+                break
+            started = time.perf_counter()
+            try:
+                passed = fn(batch)
+            except Exception as e:
+                self.log(f"⚠️ {name} stage failed: {e}")
+                passed = None
+            if self.metrics:
+                self.metrics.inc('stage_seconds', time.perf_counter() - started, stage=name)
+                self.metrics.inc('stage_hosts', len(batch), stage=name)
+                self.metrics.set('queue_depth', self.queues[i].qsize(), stage=name)
+            if passed is None:
+                passed = batch
+            keep = {id(h) for h in passed}
+            for h in batch:
+                if id(h) in keep:
+                    self._forward(i + 1, h)
                 else:
-                    log(f"⛔ Subnet {subnet} seems inactive")
-                current += 256
-            for subnet in alive_subnets:
-                if stop_flag:
+                    self._finish(h, False)
+        with self.lock:
+            self.running[i] -= 1
+            last = not self.running[i]
+        if last:
+            self._end(i + 1)
+
+# --- Scan Engine ---
+class Scanner:
+    """
+    Runs one scan described by a ScanConfig.
+
+    Progress goes to log(msg, tag) and every finished host is handed to
+    on_host(host) as soon as it is final; both default to doing nothing, so
+    the engine runs the same under the GUI, from the CLI or from a script.
+    Probe counts and stage timings accumulate in self.metrics while it runs.
+    """
+    def __init__(self, config=None, log=None, on_host=None, inventory=None):
+        self.config = config or ScanConfig()
+        self.log = log or _no_log
+        self.on_host = on_host
+        self.inventory = inventory
+        self.stop_event = threading.Event()
+        self.rtt = {probe: RttTable() for probe in RTT_PROBES} if self.config.adaptive_timeouts else None
+        self.metrics = Metrics()
+        if self.config.auto_rate:
+            self.budget = AdaptiveBudget(self.config.packet_rate, self.metrics, ceiling=self.config.rate_ceiling)
+        else:
+            self.budget = PacketBudget(self.config.packet_rate)
+        self.profiler = PhaseProfiler(self.config.profile_dir, self.config.profile_top)
+        self.ports = None
+        self.result = None
+        self.snmp_available = False
+        self.snmp_session = None
+        self.lock = threading.Lock()
+        self.previous = {}
+
+    def stop(self):
+        self.stop_event.set()
+
+    def rtt_for(self, subnet, probe):
+        """The subnet's RTT estimator for one probe type, or None when timeouts are fixed."""
+        return self.rtt[probe].get(subnet) if self.rtt else None
+
+    @property
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def load_dependencies(self):
+        """Imports only the protocol layers this scan will use, timing each one."""
+        scapy_l2(self.log)
+        if self.config.deep:
+            try:
+                if snmp_api(self.log)[2]:
+                    self.snmp_session = SnmpSession(self.config.snmp_concurrency)
+                self.snmp_available = True
+            except MissingDependency as e:
+                self.log(f"⚠️ SNMP enrichment disabled: {e}")
+
+    # --- discovery ---
+    def arp_discover(self, subnets, on_host=None):
+        """Batched ARP pass over a list of subnets; on_host gets each host as it answers."""
+        self.log(f"📡 ARP sweeping {len(subnets)} subnet(s) in one pass...")
+
+        def replied(h):
+            self.log(f" • {h.ip} is at {h.mac} ({h.subnet})")
+            if on_host:
+                on_host(h)
+
+        with self.metrics.timer('arp'), self.profiler.phase('arp'):
+            found = arp_sweep(subnets, timeout=self.config.arp_timeout, budget=self.budget, stop=self.stop_event,
+                              rtt=self.rtt and self.rtt['arp'], on_reply=replied, metrics=self.metrics)
+        self.log(f"✅ ARP found {sum(len(h) for h in found.values())} host(s) across {len(subnets)} subnet(s)")
+        return found
+
+    def find_live_subnets(self, subnets):
+        """Gateway-probes subnets in one batch and returns the live ones in input order."""
+        self.log(f"🌐 Probing {len(subnets)} subnet(s) for a gateway response...")
+        with self.metrics.timer('liveness'), self.profiler.phase('liveness'):
+            live = probe_subnets(subnets, timeout=self.config.icmp_timeout, budget=self.budget, stop=self.stop_event,
+                                 on_alive=lambda s: self.log(f"✅ Subnet {s} is alive"), log=self.log,
+                                 metrics=self.metrics)
+        self.log(f"   ↪ {len(live)}/{len(subnets)} subnet(s) answered")
+        return [s for s in subnets if s in live]
+
+    def icmp_sweep(self, block, known, on_host):
+        """Deep scan: pings every address of block not in known (ints), handing each responder to on_host."""
+        subnet = block.subnet
+        self.log(f"🔁 Deep Scan: ICMP sweeping {subnet}...")
+
+        def replied(ip):
+            self.log(f" • {ip} responded to ICMP")
+            on_host(HostRecord(ip, subnet))
+
+        targets = (int_to_ip(addr) for addr in range(block.first, block.last + 1) if addr not in known)
+        engine = icmp_engine(self.log)
+        with self.metrics.timer('icmp'), self.profiler.phase('icmp'):
+            if engine is None:
+                responders = threaded_icmp_ping(list(targets), self.stop_event, self.log)
+                for ip in sorted(responders, key=ipaddress.IPv4Address):
+                    replied(ip)
+            else:
+                responders = engine.sweep(targets, timeout=self.config.icmp_timeout, budget=self.budget,
+                                          stop=self.stop_event, rtt=self.rtt_for(subnet, 'icmp'), on_reply=replied,
+                                          metrics=self.metrics, subnet=subnet)
+        self.log(f"   ↪ Ping sweep of {subnet}: {len(responders)} host(s) answered")
+
+    # --- enrichment stages ---
+    def triage(self, hosts):
+        """
+        Incremental mode: copies stored enrichment onto hosts whose discovery
+        looks the same as last time and passes on only the ones that need work.
+        """
+        now = time.time()
+        fresh, reused = [], 0
+        for h in hosts:
+            previous = self.previous_hosts(h.subnet).get(h.addr)
+            why = enrichment_reason(h, previous, now, self.config.stale_after)
+            if why:
+                self.log(f"   ↪ {h.ip}: {why}, enriching")
+                fresh.append(h)
+                continue
+            h.hostname = previous['hostname'] or h.hostname
+            h.os = previous['os']
+            h.snmp = previous['snmp']
+            h.ports = previous['ports']
+            reused += 1
+        if reused:
+            self.log(f"♻️ {reused} unchanged host(s) reuse their last enrichment")
+        return fresh
+
+    def previous_hosts(self, subnet):
+        with self.lock:
+            if subnet not in self.previous:
+                self.previous[subnet] = self.inventory.previous(subnet)
+            return self.previous[subnet]
+
+    def resolve_names(self, hosts):
+        if self.stopped:
+            return
+        names = dns_resolver().resolve((h.ip for h in hosts), timeout=self.config.dns_timeout)
+        self.metrics.inc('probes_sent', len(hosts), stage='dns')
+        self.metrics.inc('replies', sum(1 for name in names.values() if name), stage='dns')
+        for h in hosts:
+            name = names[h.ip]
+            if name:
+                self.log(f"   ↪ {h.ip} hostname: {name}")
+                h.hostname = name
+
+    def enrich_snmp(self, hosts):
+        if not self.snmp_available or self.stopped:
+            return
+        self.log(f"   ↪ SNMP enrichment for {len(hosts)} host(s)...")
+        answers = snmp_bulk((h.ip for h in hosts), community=self.config.snmp_community,
+                            timeout=self.config.snmp_timeout, concurrency=self.config.snmp_concurrency,
+                            budget=self.budget, stop=self.stop_event, metrics=self.metrics, session=self.snmp_session,
+                            on_result=lambda ip, v: self.log(f"   ↪ {ip} OS Info: {v['sysDescr']}"))
+        for h in hosts:
+            values = answers.get(h.ip)
+            if values:
+                # identical firmware strings are common, keep one copy of each
+                h.os = sys.intern(values['sysDescr'])
+                h.snmp = values
+                if h.name is None and values.get('sysName'):
+                    h.hostname = values['sysName']
+        self.log(f"   ↪ SNMP answered on {len(answers)}/{len(hosts)} host(s)")
+
+    def enrich_hosts_ports(self, hosts):
+        if self.stopped:
+            return
+        by_subnet = {}
+        for h in hosts:
+            by_subnet.setdefault(h.subnet, []).append(h)
+        for subnet, group in by_subnet.items():
+            self.scan_ports(subnet, group)
+
+    def scan_ports(self, subnet, hosts):
+        ports = self.ports
+        # the connect limit is global, so split it across the port stage workers
+        limit = max(1, connect_budget(self.config.connect_limit) // max(1, self.config.port_workers))
+        rtt = self.rtt_for(subnet, 'tcp')
+        if rtt and rtt.samples:
+            self.log(f"   ↪ {subnet}: SRTT {rtt.srtt * 1000:.1f} ms, "
+                     f"connect timeout {rtt.timeout(self.config.tcp_timeout) * 1000:.0f} ms")
+        self.log(f"   ↪ Scanning {len(ports)} port(s) ({ports.spec}) on {len(hosts)} host(s) with up to {limit} connects in flight...")
+        filtered = set()
+
+        def on_filtered(ip):
+            filtered.add(ip)
+            self.log(f"     ↪ {ip} drops probes, treating as filtered (common ports only)")
+
+        results = tcp_connect_scan(
+            (h.ip for h in hosts), ports, concurrency=limit, timeout=self.config.tcp_timeout,
+            budget=self.budget, stop=self.stop_event, rtt=rtt, on_filtered=on_filtered,
+            metrics=self.metrics, subnet=subnet, on_open=lambda ip, port: self.log(f"     • {ip} port {port}/TCP is open"),
+            on_progress=lambda done, total: self.log(f"     ↪ Port scan progress: {done}/{total}", 'progress'))
+        for h in hosts:
+            h.ports = results[h.ip]
+            h.filtered = h.ip in filtered
+
+    def pipeline(self):
+        """Enrichment stages for this scan; quick scans have none and record hosts straight away."""
+        stages = []
+        if self.config.deep:
+            if self.config.incremental and self.inventory:
+                stages.append(('triage', self.triage, 1))
+            stages += [('dns', self.resolve_names, self.config.dns_workers),
+                       ('snmp', self.enrich_snmp, self.config.snmp_workers),
+                       ('ports', self.enrich_hosts_ports, self.config.port_workers)]
+        stages = [(name, self.profiler.wrap(name, fn), workers) for name, fn, workers in stages]
+        return StagePipeline(stages, self.profiler.wrap('export', self.finish_host), batch=self.config.stage_batch,
+                             depth=self.config.stage_depth, log=self.log, metrics=self.metrics)
+
+    def finish_host(self, host, completed):
+        with self.lock:
+            self.result.count += 1
+            if self.config.keep_hosts:
+                self.result.hosts.append(host)
+        self.metrics.inc('hosts')
+        if self.inventory:
+            self.inventory.record(host, enriched=completed and self.config.deep)
+        if self.on_host:
+            self.on_host(host)
+
+    def scan_targets(self, spec, icon="🌐", gate='silent'):
+        """
+        Streams hosts into the enrichment pipeline as they are discovered,
+        walking spec chunk_blocks /24s at a time so memory stays flat however
+        large it is. Each chunk gets one ARP pass, then in deep scans ICMP
+        sweeps of up to subnet_width subnets at a time.
+
+        gate decides which subnets need a gateway probe first: 'all' skips
+        every subnet that does not answer one (range scans), 'silent' only
+        holds back deep ICMP sweeps of subnets where ARP found nothing, and
+        None probes nothing. A sharded scan only walks its own part of spec.
+        """
+        if self.config.shards > 1:
+            spec = spec.shard(self.config.shard, self.config.shards)
+        total = spec.block_count()
+        done = 0
+        pipeline = self.pipeline()
+        try:
+            for chunk in spec.chunks(self.config.chunk_blocks):
+                if self.stopped:
                     break
-                log(f"🔍 Scanning live subnet {subnet}")
-                basic_scan(subnet)
-        elif '/' in target:
-            ipaddress.IPv4Network(target, strict=False)
-            log(f"📌 Manual scan: {target}")
-            basic_scan(target)
+                self.scan_blocks(list(enumerate(chunk, done + 1)), total, pipeline, icon, gate)
+                done += len(chunk)
+                if total > len(chunk):
+                    self.log(f"   ↪ {done}/{total} subnet(s) done ({done * 100 // total}%)", 'progress')
+        finally:
+            pipeline.close()
+
+    def scan_blocks(self, jobs, total, pipeline, icon, gate):
+        if gate == 'all':
+            live = set(self.find_live_subnets([b.subnet for _, b in jobs]))
+            jobs = [(idx, b) for idx, b in jobs if b.subnet in live]
+            if not jobs or self.stopped:
+                return
+        found = self.arp_discover([b for _, b in jobs], on_host=pipeline.offer)
+        if not self.config.deep or self.stopped:
+            return
+        if gate == 'silent':
+            silent = [b.subnet for _, b in jobs if not found[b.subnet]]
+            alive = set(self.find_live_subnets(silent)) if silent and not self.stopped else set()
+            jobs = [(idx, b) for idx, b in jobs if found[b.subnet] or b.subnet in alive]
+
+        def discover(job):
+            idx, block = job
+            if self.stopped:
+                return
+            self.log(f"{icon} [{idx}/{total}] {block.subnet}")
+            try:
+                self.icmp_sweep(block, found[block.subnet], pipeline.offer)
+            except Exception as e:
+                self.log(f"⚠️ Scan failed: {e}")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, self.config.subnet_width)) as executor:
+            list(executor.map(discover, jobs))
+
+    # --- scan types ---
+    def run(self, mode, target=None):
+        """Runs 'sweep', 'quick' or 'manual' (with target) and returns the ScanResult."""
+        runners = {'sweep': self.run_full_sweep, 'quick': self.run_quick, 'manual': self.run_manual}
+        self.result = ScanResult(mode, target)
+        try:
+            self.ports = parse_ports(self.config.ports)
+            self.load_dependencies()
+            if mode == 'manual':
+                runners[mode](target)
+            else:
+                runners[mode]()
+        finally:
+            self.result.stopped = self.stopped
+            self.result.finished = datetime.now()
+            if self.snmp_session:
+                self.snmp_session.close()
+                self.snmp_session = None
+            if self.inventory:
+                self.inventory.record_scan(self.result, self.config.deep)
+            if self.profiler:
+                self.profiler.dump(self.log)
+            if isinstance(self.budget, AdaptiveBudget):
+                self.log(f"📶 Auto rate ended at {self.budget.rate} packets/s after {self.budget.backoffs} back-off(s)")
+        return self.result
+
+    def run_full_sweep(self):
+        self.scan_targets(TargetSpec.parse('sweep'))
+        if self.stopped:
+            self.log("⛔ Sweep aborted")
+            return
+        self.log(f"🎉 Sweep complete: {self.result.count} hosts")
+
+    def run_quick(self):
+        self.scan_targets(TargetSpec.parse('quick'), icon="🔎")
+        if self.stopped:
+            self.log("⛔ Quick scan aborted")
+            return
+
+        self.log(f"✅ Quick scan complete: {self.result.count} hosts")
+
+    def run_manual(self, target):
+        """
+        Scans a target expression (IPs, CIDRs, ranges, profiles, "!" exclusions);
+        raises ValueError on bad input. When an included token is a range, only
+        /24s that answer a gateway probe are scanned.
+        """
+        spec = TargetSpec.parse(target)
+        if spec.ranged:
+            self.log(f"🌐 Range scan: {target} ({spec.block_count()} subnet(s))")
+            self.scan_targets(spec, icon="🔍", gate='all')
         else:
-            ipaddress.IPv4Address(target)
-            log(f"📌 Manual scan: {target}")
-            basic_scan(target)
-    except ValueError:
-        messagebox.showerror("Input Error", "Invalid IP, CIDR, or Range")
-        return
-    log(f"✅ Manual scan complete: {len(loot)} hosts")
+            self.log(f"📌 Manual scan: {target}")
+            self.scan_targets(spec, icon="📌", gate=None)
+        self.log(f"✅ Manual scan complete: {self.result.count} hosts")
+
+def enrichment_reason(host, previous, now, stale_after):
+    """Why a rediscovered host needs enriching again, or None if its stored data still holds."""
+    if previous is None:
+        return "new host"
+    if previous['last_enriched'] is None:
+        return "never enriched"
+    if host.hw is not None and previous['mac'] and host.mac != previous['mac'].lower():
+        return f"MAC changed from {previous['mac']}"
+    via = 'icmp' if host.hw is None else 'arp'
+    if previous['seen_via'] and via != previous['seen_via']:
+        return "now answering ICMP only" if via == 'icmp' else "now answering ARP"
+    if now - previous['last_enriched'] > stale_after:
+        return "enrichment is stale"
+    return None
 
-def ping_test(host):
-    global stop_flag
-    stop_flag = False
+def ping_test(host, stop, log):
     cmd = ['ping'] + (['-t'] if platform.system().lower() == 'windows' else []) + [host]
     log(f"📶 Pinging {host}...")
     try:
         proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
         for line in proc.stdout:
-            if stop_flag:
+            if stop.is_set():
                 proc.terminate()
                 log("⛔ Ping stopped")
                 return
@@ -282,131 +2541,1360 @@ def ping_test(host):
     except Exception as e:
         log(f"⚠️ Ping error: {e}")
 
+# --- Streaming Results ---
+RESULT_FIELDS = ('ip', 'mac', 'hostname', 'subnet', 'os', 'ports')
+
+def result_format(path, fmt=None):
+    return fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+
+class ResultWriter:
+    """
+    Appends every finished host to a JSONL or CSV file while the scan runs.
+
+    Writes go through a buffered file; a background thread flushes and
+    fsyncs it every fsync_interval seconds while there is unsynced data, and
+    close() does a final sync. If the process dies mid-sweep, at most the
+    last interval's hosts are lost.
+    """
+    def __init__(self, path, fmt=None, fsync_interval=5.0):
+        self.path = path
+        self.fmt = result_format(path, fmt)
+        self.fsync_interval = fsync_interval
+        self.count = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', buffering=1 << 16, newline='' if self.fmt == 'csv' else None, encoding='utf-8')
+        if self.fmt == 'csv':
+            self.csv = csv.writer(self.file)
+            if self.file.tell() == 0:
+                self.csv.writerow(RESULT_FIELDS)
+        self.closed = threading.Event()
+        self.syncer = threading.Thread(target=self._sync_loop, daemon=True)
+        self.syncer.start()
+
+    def write(self, host):
+        record = host.to_dict()
+        with self.lock:
+            if self.fmt == 'csv':
+                self.csv.writerow([' '.join(map(str, record[f])) if f == 'ports' else record[f] for f in RESULT_FIELDS])
+            else:
+                self.file.write(json.dumps(record) + '\n')
+            self.count += 1
+            self.dirty = True
+
+    def sync(self):
+        with self.lock:
+            if not self.dirty or self.file.closed:
+                return
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.dirty = False
+
+    def _sync_loop(self):
+        while not self.closed.wait(self.fsync_interval):
+            self.sync()
+
+    def close(self):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self.sync()
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_results(path, fmt=None):
+    """Yields host dicts back out of a JSONL or CSV results file, one at a time."""
+    with open(path, newline='' if result_format(path, fmt) == 'csv' else None, encoding='utf-8') as f:
+        if result_format(path, fmt) == 'csv':
+            for row in csv.DictReader(f):
+                row['ports'] = [int(p) for p in row['ports'].split()]
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+# --- Inventory Store ---
+INVENTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    ip INTEGER PRIMARY KEY,
+    mac TEXT,
+    hostname TEXT,
+    subnet TEXT,
+    os TEXT,
+    seen_via TEXT,
+    snmp TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_enriched REAL
+);
+CREATE INDEX IF NOT EXISTS hosts_mac ON hosts (mac);
+CREATE INDEX IF NOT EXISTS hosts_last_seen ON hosts (last_seen);
+CREATE TABLE IF NOT EXISTS ports (
+    port INTEGER NOT NULL,
+    ip INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (port, ip)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ports_ip ON ports (ip);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    mode TEXT,
+    target TEXT,
+    deep INTEGER,
+    started REAL,
+    finished REAL,
+    hosts INTEGER
+);
+"""
+
+UPSERT_HOST = """
+INSERT INTO hosts (ip, mac, hostname, subnet, os, seen_via, snmp, first_seen, last_seen, last_enriched)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (ip) DO UPDATE SET
+    mac = COALESCE(excluded.mac, hosts.mac),
+    hostname = COALESCE(excluded.hostname, hosts.hostname),
+    subnet = excluded.subnet,
+    os = COALESCE(excluded.os, hosts.os),
+    seen_via = excluded.seen_via,
+    snmp = CASE WHEN excluded.last_enriched IS NULL THEN hosts.snmp ELSE excluded.snmp END,
+    last_seen = excluded.last_seen,
+    last_enriched = COALESCE(excluded.last_enriched, hosts.last_enriched)
+"""
+
+UPSERT_PORT = """
+INSERT INTO ports (port, ip, first_seen, last_seen) VALUES (?, ?, ?, ?)
+ON CONFLICT (port, ip) DO UPDATE SET last_seen = excluded.last_seen
+"""
+
+def parse_age(text):
+    """'90s', '30m', '12h' or '7d' -> seconds."""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+INVENTORY_PATH = 'LANLord_inventory.db'
+
+class Inventory:
+    """
+    Persistent SQLite inventory of every host and port LANLord has seen.
+
+    Addresses are stored as integers, so CIDR questions are range scans on
+    the primary key, and ports are keyed (port, ip), so "every host with 22
+    open in 10.0.0.0/16" is a single index range. record() only queues the
+    host; one writer thread commits queued hosts in batched transactions.
+    A batch that fails to commit is logged and counted in lost, and the
+    writer carries on with the next; close() reports the total.
+    """
+    BATCH = 500
+
+    def __init__(self, path, flush_interval=1.0, log=_no_log):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.log = log
+        self.lost = 0
+        self.error = None
+        self.queue = queue.Queue()
+        conn = self.connect()
+        conn.executescript(INVENTORY_SCHEMA)
+        # inventories written before seen_via or snmp existed
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(hosts)')]
+        for column in ('seen_via', 'snmp'):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE hosts ADD COLUMN {column} TEXT')
+        conn.close()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def record(self, host, enriched=False, seen=None):
+        """Queues a finished host; enriched means its ports and OS are fresh."""
+        if not self.writer.is_alive():
+            self.lost += 1
+            return
+        self.queue.put((host, enriched, seen or time.time()))
+
+    def record_scan(self, result, deep):
+        self.queue.put(('scan', result.summary(), deep))
+
+    def _write_loop(self):
+        try:
+            conn = self.connect()
+        except sqlite3.Error as e:
+            self.error = e
+            self.log(f"⚠️ Inventory {self.path} unavailable ({e}), hosts will not be recorded")
+            return
+        closing = False
+        while not closing:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None or None in batch:
+                closing = True
+                batch = [item for item in batch if item is not None]
+            try:
+                self._write_batch(conn, batch)
+            except sqlite3.Error as e:
+                self.error = e
+                self.lost += len(batch)
+                self.log(f"⚠️ Inventory write failed ({e}): {len(batch)} record(s) lost")
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        hosts, ports, scans = [], [], []
+        for item in batch:
+            if item[0] == 'scan':
+                summary, deep = item[1], item[2]
+                scans.append((summary['mode'], summary['target'], int(deep),
+                              datetime.fromisoformat(summary['started']).timestamp(),
+                              datetime.fromisoformat(summary['finished']).timestamp() if summary['finished'] else None,
+                              summary['hosts']))
+                continue
+            host, enriched, seen = item
+            ip = host.addr
+            known_mac = host.hw is not None
+            hosts.append((ip, host.mac if known_mac else None, host.name, host.subnet, host.os or None,
+                          'arp' if known_mac else 'icmp', json.dumps(host.snmp) if host.snmp else None,
+                          seen, seen, seen if enriched else None))
+            if enriched:
+                ports += [(port, ip, seen, seen) for port in host.ports]
+        with conn:
+            conn.executemany(UPSERT_HOST, hosts)
+            conn.executemany(UPSERT_PORT, ports)
+            conn.executemany('INSERT INTO scans (mode, target, deep, started, finished, hosts) VALUES (?, ?, ?, ?, ?, ?)', scans)
+
+    def close(self):
+        """Commits everything still queued and stops the writer."""
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        else:
+            self.lost += self.queue.qsize()
+        if self.lost:
+            self.log(f"⚠️ Inventory {self.path}: {self.lost} record(s) not saved (last error: {self.error})")
+
+    def previous(self, subnet):
+        """Stored state of every known host inside subnet, keyed by integer address."""
+        net = ipaddress.IPv4Network(subnet, strict=False)
+        conn = self.connect()
+        try:
+            rows = conn.execute("""SELECT h.ip, h.mac, h.hostname, h.os, h.seen_via, h.snmp, h.last_enriched,
+                (SELECT group_concat(q.port, ' ') FROM ports q WHERE q.ip = h.ip AND q.last_seen >= h.last_enriched)
+                FROM hosts h WHERE h.ip BETWEEN ? AND ?""",
+                (int(net.network_address), int(net.broadcast_address))).fetchall()
+        finally:
+            conn.close()
+        known = {}
+        for ip, mac, hostname, os_info, via, snmp, last_enriched, open_ports in rows:
+            known[ip] = {
+                "mac": mac, "hostname": hostname, "os": os_info or "", "seen_via": via,
+                "snmp": json.loads(snmp) if snmp else None, "last_enriched": last_enriched,
+                "ports": sorted(int(p) for p in open_ports.split()) if open_ports else [],
+            }
+        return known
+
+    def query(self, port=None, cidr=None, since=None):
+        """
+        Yields stored hosts in address order, optionally only those inside
+        cidr, seen within the last `since` seconds, or with `port` open at
+        their latest enrichment.
+        """
+        lo, hi = 0, 0xffffffff
+        if cidr:
+            net = ipaddress.IPv4Network(cidr, strict=False)
+            lo, hi = int(net.network_address), int(net.broadcast_address)
+        columns = """h.ip, h.mac, h.hostname, h.subnet, h.os, h.first_seen, h.last_seen,
+            (SELECT group_concat(q.port, ' ') FROM ports q WHERE q.ip = h.ip AND q.last_seen >= h.last_enriched)"""
+        if port is not None:
+            sql = f"""SELECT {columns} FROM ports p JOIN hosts h ON h.ip = p.ip
+                WHERE p.port = ? AND p.ip BETWEEN ? AND ? AND p.last_seen >= h.last_enriched"""
+            params = [port, lo, hi]
+        else:
+            sql = f"SELECT {columns} FROM hosts h WHERE h.ip BETWEEN ? AND ?"
+            params = [lo, hi]
+        if since is not None:
+            sql += " AND h.last_seen >= ?"
+            params.append(time.time() - since)
+        sql += " ORDER BY h.ip"
+        conn = self.connect()
+        try:
+            for ip, mac, hostname, subnet, os_info, first, last, open_ports in conn.execute(sql, params):
+                ip = str(ipaddress.IPv4Address(ip))
+                yield {
+                    "ip": ip, "mac": mac or "?", "hostname": hostname or ip, "subnet": subnet, "os": os_info or "",
+                    "ports": sorted(int(p) for p in open_ports.split()) if open_ports else [],
+                    "first_seen": datetime.fromtimestamp(first).isoformat(timespec='seconds'),
+                    "last_seen": datetime.fromtimestamp(last).isoformat(timespec='seconds'),
+                }
+        finally:
+            conn.close()
+
 # --- Export ---
-def export_loot():
-    if not loot:
+def export_loot(results_path, filename=None, log=_no_log):
+    """Renders the Markdown report from a results file without loading it into memory."""
+    if not results_path or not os.path.exists(results_path):
         log("⚠️ Nothing to export.")
-        return
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"LANLord_loot_{timestamp}.md"
-    lines = ["# LANLord Scan Report\n"]
-    for i, h in enumerate(loot, 1):
-        lines += [
-            f"## Host {i}: {h['ip']} ({h['hostname']})",
-            f"**Subnet:** `{h['subnet']}`",
-            f"**MAC:** `{h['mac']}`",
-            f"**OS:** `{h['os'] or 'Unknown'}`",
-            "**Open Ports:**",
-        ]
-        lines += [f"- {p}" for p in h['ports']] if h['ports'] else ["- None"]
-        lines.append("")
+        return None
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filename = f"LANLord_loot_{timestamp}.md"
     try:
-        with open(filename, 'w') as f:
-            f.write('\n'.join(lines))
-        log(f"✅ Exported to {filename}")
+        count = 0
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write("# LANLord Scan Report\n\n")
+            for i, h in enumerate(read_results(results_path), 1):
+                lines = [
+                    f"## Host {i}: {h['ip']} ({h['hostname']})",
+                    f"**Subnet:** `{h['subnet']}`",
+                    f"**MAC:** `{h['mac']}`",
+                    f"**OS:** `{h['os'] or 'Unknown'}`",
+                    "**Open Ports:**",
+                ]
+                lines += [f"- {p}" for p in h['ports']] if h['ports'] else ["- None"]
+                lines.append("")
+                f.write('\n'.join(lines) + '\n')
+                count = i
+        if not count:
+            os.remove(filename)
+            log("⚠️ Nothing to export.")
+            return None
+        log(f"✅ Exported {count} host(s) to {filename}")
+        return filename
     except Exception as e:
         log(f"⚠️ Export failed: {e}")
+        return None
+
+# --- Distributed Scanning ---
+COORDINATOR_PORT = 7331
+LEASE_SECONDS = 60.0
+# ScanConfig fields a coordinator decides for its workers
+WORKER_CONFIG = ('deep', 'packet_rate', 'auto_rate', 'rate_ceiling', 'connect_limit', 'subnet_width', 'ports', 'snmp_community',
+                 'adaptive_timeouts', 'arp_timeout', 'icmp_timeout', 'tcp_timeout', 'snmp_timeout', 'dns_timeout')
+
+def send_message(sock, lock, message):
+    data = (json.dumps(message) + '\n').encode()
+    with lock:
+        sock.sendall(data)
 
-# --- Ping Thread Control ---
-thread_limit = tk.IntVar(value=10)
+class WorkUnit:
+    """One shard of the coordinator's target, and who holds it until when."""
+    __slots__ = ('index', 'attempt', 'worker', 'expires', 'spool', 'hosts', 'done')
 
-def threaded_icmp_sweep(ip_list, scanned, hosts, subnet):
-    import concurrent.futures
-    with concurrent.futures.ThreadPoolExecutor(max_workers=thread_limit.get()) as executor:
-        futures = {executor.submit(icmp_ping, str(ip)): str(ip) for ip in ip_list if str(ip) not in scanned}
-        for idx, (future, ip) in enumerate(futures.items()):
-            if stop_flag:
+    def __init__(self, index):
+        self.index = index
+        self.attempt = 0
+        self.worker = None
+        self.expires = 0.0
+        self.spool = None
+        self.hosts = 0
+        self.done = False
+
+class Coordinator:
+    """
+    Splits a target into work units (TargetSpec shards) and leases them to
+    WorkerAgents over TCP, one JSON object per line:
+
+      worker  {"type": "hello", "worker": name, "secret": s}
+      coord   {"type": "lease", "unit": i, "units": n, "attempt": a, "target": t, "config": {...}, "lease": s}
+              or {"type": "wait", "retry": s} while every unit is out, {"type": "done"} at the end
+      worker  {"type": "host", "unit": i, "attempt": a, "host": {...}} for each host found,
+              {"type": "heartbeat", ...} to renew the lease, {"type": "complete", ..., "ok": bool}
+              when the unit is finished, {"type": "ready"} after a wait
+
+    A lease lapses when nothing arrives for lease seconds or its worker
+    disconnects, and the unit goes back in the queue. Hosts are spooled per
+    lease and only passed to on_line(json_line) once the unit completes, so
+    every unit is reported exactly once however often it is re-leased. The
+    spool is replayed outside the lease lock, one unit at a time, so a slow
+    consumer holds up output but not other workers' heartbeats.
+    """
+    def __init__(self, target, units, config, lease=LEASE_SECONDS, secret=None, on_line=None, log=_no_log):
+        self.target = target
+        self.units = [WorkUnit(i) for i in range(units)]
+        self.pending = deque(self.units)
+        self.config = config
+        self.lease = lease
+        self.secret = secret
+        self.on_line = on_line or (lambda line: None)
+        self.log = log
+        self.lock = threading.Lock()
+        self.workers = {}
+        self.ids = itertools.count(1)
+        self.completed = 0
+        self.output = threading.Lock()
+        self.reported = 0
+        self.closed = False
+        self.address = None
+        self.ready = threading.Event()
+        self.finished = threading.Event()
+
+    def stop(self):
+        self.finished.set()
+
+    def serve(self, host='127.0.0.1', port=COORDINATOR_PORT):
+        """Accepts workers until every unit is complete or stop() is called; returns (completed, units)."""
+        server = socket.create_server((host, port))
+        server.settimeout(0.5)
+        self.address = server.getsockname()
+        self.log(f"🛰 Coordinating {self.target} as {len(self.units)} unit(s) on {self.address[0]}:{self.address[1]}")
+        self.ready.set()
+        threading.Thread(target=self._reap, name='lease-reaper', daemon=True).start()
+        try:
+            while not self.finished.is_set():
+                try:
+                    conn, addr = server.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._handle, args=(conn, addr), daemon=True).start()
+        finally:
+            self.finished.set()
+            server.close()
+            with self.output:
+                # a replay still waiting for its turn would write after the caller closed its output
+                self.closed = True
+            with self.lock:
+                workers = list(self.workers.values())
+            for _, conn, lock in workers:
+                try:
+                    send_message(conn, lock, {'type': 'done'})
+                except OSError:
+                    pass
+        return self.reported, len(self.units)
+
+    def _handle(self, conn, addr):
+        wid, lock = next(self.ids), threading.Lock()
+        name = f"{addr[0]}:{addr[1]}"
+        try:
+            reader = conn.makefile('r', encoding='utf-8')
+            hello = json.loads(reader.readline() or 'null')
+            if not isinstance(hello, dict) or hello.get('type') != 'hello':
                 return
+            if self.secret and not hmac.compare_digest(str(hello.get('secret') or ''), self.secret):
+                self.log(f"⚠️ Rejected worker at {name}: wrong secret")
+                send_message(conn, lock, {'type': 'error', 'error': 'wrong secret'})
+                return
+            name = f"{hello.get('worker') or 'worker'}@{addr[0]}"
+            with self.lock:
+                self.workers[wid] = (name, conn, lock)
+            self.log(f"🤝 {name} joined")
+            self._assign(wid, name, conn, lock)
+            for line in reader:
+                message = json.loads(line)
+                kind = message.get('type')
+                if kind == 'host':
+                    self._host(wid, message)
+                elif kind == 'heartbeat':
+                    with self.lock:
+                        self._owned(wid, message)
+                elif kind == 'complete':
+                    self._complete(wid, name, message)
+                    self._assign(wid, name, conn, lock)
+                elif kind == 'ready':
+                    self._assign(wid, name, conn, lock)
+        except (OSError, ValueError) as e:
+            self.log(f"⚠️ {name}: {e}")
+        finally:
+            with self.lock:
+                self.workers.pop(wid, None)
+            self._release(lambda unit: unit.worker == wid, f"{name} left")
+            conn.close()
+
+    def _assign(self, wid, name, conn, lock):
+        with self.lock:
+            if self.finished.is_set():
+                message = {'type': 'done'}
+            elif self.pending:
+                unit = self.pending.popleft()
+                unit.attempt += 1
+                unit.worker = wid
+                unit.expires = time.monotonic() + self.lease
+                unit.spool = tempfile.TemporaryFile('w+', encoding='utf-8')
+                unit.hosts = 0
+                message = {'type': 'lease', 'unit': unit.index, 'units': len(self.units), 'attempt': unit.attempt,
+                           'target': self.target, 'config': self.config, 'lease': self.lease}
+                self.log(f"📦 Unit {unit.index + 1}/{len(self.units)} leased to {name}"
+                         f"{f' (attempt {unit.attempt})' if unit.attempt > 1 else ''}")
+            else:
+                message = {'type': 'wait', 'retry': min(5.0, self.lease / 4)}
+        send_message(conn, lock, message)
+
+    def _owned(self, wid, message):
+        """The unit a message is about if wid still holds that lease, which it renews; None otherwise. Call with the lock held."""
+        index = message.get('unit')
+        unit = self.units[index] if isinstance(index, int) and 0 <= index < len(self.units) else None
+        if unit is None or unit.done or unit.worker != wid or unit.attempt != message.get('attempt'):
+            return None
+        unit.expires = time.monotonic() + self.lease
+        return unit
+
+    def _host(self, wid, message):
+        with self.lock:
+            unit = self._owned(wid, message)
+            if unit:
+                unit.spool.write(json.dumps(message['host']) + '\n')
+                unit.hosts += 1
+
+    def _complete(self, wid, name, message):
+        with self.lock:
+            unit = self._owned(wid, message)
+            if unit is None:
+                return
+            if not message.get('ok'):
+                self._requeue(unit, f"{name} could not finish it: {message.get('error') or 'stopped'}")
+                return
+            unit.done = True
+            unit.worker = None
+            spool, unit.spool = unit.spool, None
+            self.completed += 1
+        with self.output:
+            if self.closed:
+                spool.close()
+                return
+            spool.seek(0)
+            for line in spool:
+                self.on_line(line)
+            spool.close()
+            self.reported += 1
+            self.log(f"✅ Unit {unit.index + 1}/{len(self.units)} done by {name}: {unit.hosts} host(s) "
+                     f"({self.reported}/{len(self.units)} complete)")
+            if self.reported == len(self.units):
+                self.finished.set()
+
+    def _requeue(self, unit, why):
+        unit.worker = None
+        if unit.spool:
+            unit.spool.close()
+            unit.spool = None
+        # lapsed units go first so a dead worker does not leave a hole at the front
+        self.pending.appendleft(unit)
+        self.log(f"↩️ Unit {unit.index + 1}/{len(self.units)} back in the queue: {why}")
+
+    def _release(self, which, why):
+        with self.lock:
+            for unit in self.units:
+                if unit.worker is not None and not unit.done and which(unit):
+                    self._requeue(unit, why)
+
+    def _reap(self):
+        while not self.finished.wait(1.0):
+            now = time.monotonic()
+            self._release(lambda unit: unit.expires < now, "lease expired")
+
+class WorkerAgent:
+    """
+    Scans the units a Coordinator leases to it and streams the hosts back.
+
+    Each lease runs as an ordinary Scanner on shard unit/units of the
+    coordinator's target with the coordinator's config, while a heartbeat
+    renews the lease. Connecting is retried for patience seconds, so
+    workers can be started before the coordinator.
+    """
+    def __init__(self, address, name=None, secret=None, patience=30.0, log=_no_log, scan_log=None):
+        self.address = address
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.secret = secret
+        self.patience = patience
+        self.log = log
+        self.scan_log = scan_log
+        self.scanner = None
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+        if self.scanner:
+            self.scanner.stop()
+
+    def _connect(self):
+        deadline = time.monotonic() + self.patience
+        while True:
             try:
-                if future.result():
-                    try:
-                        hostname = socket.gethostbyaddr(ip)[0]
-                        log(f" • {ip} responded to ICMP ({hostname})")
-                    except:
-                        hostname = ip
-                        log(f" • {ip} responded to ICMP (no hostname)")
-                    hosts[ip] = {"ip": ip, "mac": "?", "hostname": hostname, "subnet": subnet, "ports": [], "os": ""}
-            except Exception as e:
-                log(f"   ↪ Error pinging {ip}: {e}")
-            if idx % 16 == 0:
-                log(f"   ↪ Ping sweep progress: {idx} hosts checked")
-
-# --- Controls ---
-def toggle_deep():
-    global is_deep_scan
-    is_deep_scan = not is_deep_scan
-    btn_deep.config(relief=tk.SUNKEN if is_deep_scan else tk.RAISED)
-    log(f"⚙ Deep Scan {'ON' if is_deep_scan else 'OFF'}")
-
-def stop():
-    global stop_flag
-    stop_flag = True
-    log("⛔ Operation stopped")
-
-# --- GUI Setup ---
-tb = tk.Frame(window, bg='#1e1e1e')
-tb.pack(pady=10)
-btn_full = tk.Button(tb, text='Sweep', bg='#333', fg='#0f0', width=12, command=lambda: threading.Thread(target=run_full_sweep, daemon=True).start())
-btn_full.grid(row=0, column=0, padx=5)
-btn_quick = tk.Button(tb, text='Quick Scan', bg='#333', fg='#0f0', width=12, command=lambda: threading.Thread(target=run_quick, daemon=True).start())
-btn_quick.grid(row=0, column=1, padx=5)
-btn_deep = tk.Button(tb, text='Deep Scan', bg='#444', fg='#0f0', width=12, command=toggle_deep)
-btn_deep.grid(row=0, column=2, padx=5)
-btn_stop = tk.Button(tb, text='Stop', bg='#222', fg='#f55', width=12, command=stop)
-btn_stop.grid(row=0, column=3, padx=5)
-btn_export = tk.Button(tb, text='Export Loot', bg='#333', fg='#0f0', width=12, command=export_loot)
-btn_export.grid(row=0, column=4, padx=5)
-btn_clear = tk.Button(tb, text='Clear Log', bg='#555', fg='#fff', width=12, command=clear_log)
-btn_clear.grid(row=0, column=5, padx=5)
-ctx_lbl = tk.Label(tb, text='Manual Scan (IP/CIDR):', bg='#1e1e1e', fg='#0f0')
-ctx_lbl.grid(row=1, column=0, padx=5, pady=5)
-entry_manual = tk.Entry(tb, bg='#333', fg='#0f0', insertbackground='#0f0')
-entry_manual.grid(row=1, column=1, padx=5, pady=5)
-tk.Button(tb, text='Manual Scan', bg='#333', fg='#0f0', width=12, command=lambda: threading.Thread(target=run_manual, args=(entry_manual.get(),), daemon=True).start()).grid(row=1, column=2, padx=5)
-ping_lbl = tk.Label(tb, text='Ping Test (host):', bg='#1e1e1e', fg='#0f0')
-ping_lbl.grid(row=1, column=3, padx=5, pady=5)
-entry_ping = tk.Entry(tb, bg='#333', fg='#0f0', insertbackground='#0f0')
-entry_ping.grid(row=1, column=4, padx=5, pady=5)
-tk.Button(tb, text='Ping Test', bg='#333', fg='#0f0', width=12, command=lambda: threading.Thread(target=ping_test, args=(entry_ping.get(),), daemon=True).start()).grid(row=1, column=5, padx=5)
-output = scrolledtext.ScrolledText(window, wrap=tk.WORD, bg='#111', fg='#0f0', insertbackground='#0f0')
-output.pack(fill='both', expand=True, padx=10, pady=10)
-
-# Thread slider control
-port_thread_frame = tk.Frame(window, bg='#1e1e1e')
-port_thread_frame.pack(pady=0)
-tk.Label(port_thread_frame, text='Max Port Threads:', bg='#1e1e1e', fg='#0f0').pack(side='left', padx=5)
-port_slider = tk.Scale(port_thread_frame, from_=1, to=200, orient='horizontal', variable=port_thread_limit,
-                         bg='#222', fg='#0f0', troughcolor='#333', highlightthickness=0, length=200)
-port_slider.pack(side='left')
-thread_frame = tk.Frame(window, bg='#1e1e1e')
-thread_frame.pack(pady=5)
-tk.Label(thread_frame, text='Max Ping Threads:', bg='#1e1e1e', fg='#0f0').pack(side='left', padx=5)
-thread_slider = tk.Scale(thread_frame, from_=1, to=100, orient='horizontal', variable=thread_limit,
-                         bg='#222', fg='#0f0', troughcolor='#333', highlightthickness=0, length=200)
-thread_slider.pack(side='left')
-log("""
-██╗      █████╗ ███╗   ██╗██╗      ██████╗ ██████╗ ██████╗ 
+                return socket.create_connection(self.address, timeout=10)
+            except OSError:
+                if time.monotonic() > deadline or self.stopping.is_set():
+                    raise
+                time.sleep(1.0)
+
+    def run(self):
+        """Works until the coordinator says done; returns the number of units completed. Raises OSError if it goes away."""
+        sock = self._connect()
+        sock.settimeout(None)
+        lock = threading.Lock()
+        completed = [0]
+        scan = None
+        try:
+            reader = sock.makefile('r', encoding='utf-8')
+            send_message(sock, lock, {'type': 'hello', 'worker': self.name, 'secret': self.secret})
+            for line in reader:
+                message = json.loads(line)
+                kind = message.get('type')
+                if kind == 'done':
+                    break
+                if kind == 'error':
+                    raise ConnectionError(message.get('error'))
+                if kind == 'wait':
+                    if self.stopping.wait(message.get('retry', 2.0)):
+                        break
+                    send_message(sock, lock, {'type': 'ready'})
+                elif kind == 'lease':
+                    if self.stopping.is_set():
+                        break
+                    scan = threading.Thread(target=self._scan, args=(sock, lock, message, completed), daemon=True)
+                    scan.start()
+            else:
+                if not self.stopping.is_set():
+                    raise ConnectionError("coordinator closed the connection")
+        finally:
+            self.stop()
+            if scan:
+                scan.join()
+            sock.close()
+        # only counted once the last unit's thread has finished
+        return completed[0]
+
+    def _scan(self, sock, lock, lease, completed):
+        tag = {'unit': lease['unit'], 'attempt': lease['attempt']}
+        config = ScanConfig(**{k: v for k, v in lease['config'].items() if k in WORKER_CONFIG},
+                            keep_hosts=False, shard=lease['unit'], shards=lease['units'])
+        scanner = self.scanner = Scanner(config, log=self.scan_log,
+                                         on_host=lambda host: send_message(sock, lock, {'type': 'host', **tag,
+                                                                                        'host': host.to_dict()}))
+        beat = threading.Event()
+
+        def heartbeat():
+            while not beat.wait(lease['lease'] / 4):
+                try:
+                    send_message(sock, lock, {'type': 'heartbeat', **tag})
+                except OSError:
+                    return
+
+        self.log(f"📦 Unit {lease['unit'] + 1}/{lease['units']} of {lease['target']}")
+        threading.Thread(target=heartbeat, daemon=True).start()
+        error = None
+        try:
+            result = scanner.run(*scan_mode(lease['target']))
+            self.log(f"✅ Unit {lease['unit'] + 1}/{lease['units']}: {result.count} host(s)")
+        except (ValueError, MissingDependency) as e:
+            error = str(e)
+            self.log(f"⚠️ Unit {lease['unit'] + 1}/{lease['units']} failed: {e}")
+        except Exception as e:
+            error = repr(e)
+            self.log(f"⚠️ Unit {lease['unit'] + 1}/{lease['units']} failed: {e!r}")
+        finally:
+            beat.set()
+        ok = error is None and not scanner.stopped
+        try:
+            send_message(sock, lock, {'type': 'complete', **tag, 'ok': ok, 'error': error})
+        except OSError:
+            return
+        if ok:
+            completed[0] += 1
+        elif error:
+            # the same failure would come back on every unit, so leave the rest to other workers
+            self.stop()
+            sock.shutdown(socket.SHUT_RDWR)
+
+# --- GUI Log Sink ---
+LOG_FRAME_MS = 50
+LOG_BATCH_LINES = 2000
+
+class LogSink:
+    """
+    Queue between scan threads and the log widget.
+
+    write() never blocks and never touches Tk: lines land in a bounded queue
+    that the GUI drains once per frame. A line tagged 'progress' retires the
+    previous progress line still waiting in the queue, and when the queue is
+    full the oldest lines are dropped and counted instead of slowing the scan.
+    """
+    def __init__(self, capacity=20000):
+        self.capacity = capacity
+        self.lines = deque()
+        self.progress = None
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def write(self, msg, tag=None):
+        with self.lock:
+            if tag == 'progress' and self.progress is not None:
+                self.progress[0] = None
+            if len(self.lines) >= self.capacity:
+                if self.lines.popleft()[0] is not None:
+                    self.dropped += 1
+            entry = [msg, tag]
+            self.lines.append(entry)
+            if tag == 'progress':
+                self.progress = entry
+
+    def drain(self, limit):
+        """Returns up to limit queued (msg, tag) pairs and the drop count since the last drain."""
+        with self.lock:
+            batch = [self.lines.popleft() for _ in range(min(limit, len(self.lines)))]
+            if any(entry is self.progress for entry in batch):
+                self.progress = None
+            dropped, self.dropped = self.dropped, 0
+        return [(msg, tag) for msg, tag in batch if msg is not None], dropped
+
+# --- GUI ---
+BANNER = """
+██╗      █████╗ ███╗   ██╗██╗      ██████╗ ██████╗ ██████╗
 ██║     ██╔══██╗████╗  ██║██║     ██╔═══██╗██╔══██╗██╔══██╗
 ██║     ███████║██╔██╗ ██║██║     ██║   ██║██████╔╝██║  ██║
 ██║     ██╔══██║██║╚██╗██║██║     ██║   ██║██╔══██╗██║  ██║
 ███████╗██║  ██║██║ ╚████║███████╗╚██████╔╝██║  ██║██████╔╝
-╚══════╝╚═╝  ╚═╝╚═╝  ╚═══╝╚══════╝ ╚═════╝ ╚═╝  ╚═╝╚═════╝                                  
+╚══════╝╚═╝  ╚═╝╚═╝  ╚═══╝╚══════╝ ╚═════╝ ╚═╝  ╚═╝╚═════╝
 
 Welcome to LANLord  | RFC1918 Mapper & Scanner v0.9
 --------------------------------------------
 YOU control the LAN | Powered by rowan.wtf
 
-       /|\ ^._.^ /|\ 
+       /|\\ ^._.^ /|\\
 
 Sweep               | Scan all private /24 ranges
 Quick Scan          | Common subnets
 Deep Scan           | SNMP enrichment
+Incremental         | Deep Scan only new/changed hosts
+Metrics             | Live probe counts and stage timings
+Profile             | cProfile every scan phase to a folder
+Auto Rate           | Tune packets/s to loss, slider sets the start
 Manual Scan         | IP/CIDR input
-Scan Range          | 10.0.0.0/24 - 10.0.254.0/24 
+Scan Range          | 10.0.0.0/24 - 10.0.254.0/24
 Ping Test           | Ping a host indefinetely
 Stop                | Cancel scan
 Export Loot         | Save results
 Clear Log           | Reset output
-    
-""".strip())
-window.mainloop()
+
+""".strip()
+
+class LANLordGUI:
+    """The Tk front end; it only builds ScanConfigs and feeds Scanner output to the log."""
+    def __init__(self, scrollback=5000):
+        self.is_deep_scan = False
+        self.is_incremental = False
+        self.scanner = None
+        self.results_path = None
+        self.writer = None
+        self.ping_stop = threading.Event()
+        self.output = None
+        self.scrollback = scrollback
+        self.sink = LogSink()
+
+        window = self.window = tk.Tk()
+        window.title('LANLord v0.9')
+        window.configure(bg='#1e1e1e')
+        self.connect_limit = tk.IntVar(value=1000)
+        self.packet_rate = tk.IntVar(value=5000)
+        self.subnet_width = tk.IntVar(value=8)
+
+        tb = tk.Frame(window, bg='#1e1e1e')
+        tb.pack(pady=10)
+        btn_full = tk.Button(tb, text='Sweep', bg='#333', fg='#0f0', width=12, command=lambda: self.start_scan('sweep'))
+        btn_full.grid(row=0, column=0, padx=5)
+        btn_quick = tk.Button(tb, text='Quick Scan', bg='#333', fg='#0f0', width=12, command=lambda: self.start_scan('quick'))
+        btn_quick.grid(row=0, column=1, padx=5)
+        self.btn_deep = tk.Button(tb, text='Deep Scan', bg='#444', fg='#0f0', width=12, command=self.toggle_deep)
+        self.btn_deep.grid(row=0, column=2, padx=5)
+        btn_stop = tk.Button(tb, text='Stop', bg='#222', fg='#f55', width=12, command=self.stop)
+        btn_stop.grid(row=0, column=3, padx=5)
+        btn_export = tk.Button(tb, text='Export Loot', bg='#333', fg='#0f0', width=12, command=self.export)
+        btn_export.grid(row=0, column=4, padx=5)
+        btn_clear = tk.Button(tb, text='Clear Log', bg='#555', fg='#fff', width=12, command=self.clear_log)
+        btn_clear.grid(row=0, column=5, padx=5)
+        ctx_lbl = tk.Label(tb, text='Manual Scan (IP/CIDR):', bg='#1e1e1e', fg='#0f0')
+        ctx_lbl.grid(row=1, column=0, padx=5, pady=5)
+        entry_manual = tk.Entry(tb, bg='#333', fg='#0f0', insertbackground='#0f0')
+        entry_manual.grid(row=1, column=1, padx=5, pady=5)
+        tk.Button(tb, text='Manual Scan', bg='#333', fg='#0f0', width=12, command=lambda: self.start_scan('manual', entry_manual.get())).grid(row=1, column=2, padx=5)
+        ping_lbl = tk.Label(tb, text='Ping Test (host):', bg='#1e1e1e', fg='#0f0')
+        ping_lbl.grid(row=1, column=3, padx=5, pady=5)
+        entry_ping = tk.Entry(tb, bg='#333', fg='#0f0', insertbackground='#0f0')
+        entry_ping.grid(row=1, column=4, padx=5, pady=5)
+        tk.Button(tb, text='Ping Test', bg='#333', fg='#0f0', width=12, command=lambda: self.start_ping(entry_ping.get())).grid(row=1, column=5, padx=5)
+        self.btn_incremental = tk.Button(tb, text='Incremental', bg='#444', fg='#0f0', width=12, command=self.toggle_incremental)
+        self.btn_incremental.grid(row=2, column=2, padx=5)
+        tk.Button(tb, text='Metrics', bg='#333', fg='#0f0', width=12, command=self.show_metrics).grid(row=2, column=3, padx=5)
+        self.btn_profile = tk.Button(tb, text='Profile', bg='#444', fg='#0f0', width=12, command=self.toggle_profile)
+        self.btn_profile.grid(row=2, column=4, padx=5)
+        self.btn_auto_rate = tk.Button(tb, text='Auto Rate', bg='#444', fg='#0f0', width=12, command=self.toggle_auto_rate)
+        self.btn_auto_rate.grid(row=2, column=5, padx=5)
+        self.is_profiling = False
+        self.is_auto_rate = False
+        self.metrics_window = None
+        self.output = scrolledtext.ScrolledText(window, wrap=tk.WORD, bg='#111', fg='#0f0', insertbackground='#0f0')
+        self.output.pack(fill='both', expand=True, padx=10, pady=10)
+
+        # Slider controls
+        self.add_slider('Max Open Connects:', self.connect_limit, 1, 5000)
+        self.add_slider('Max Packets/s:', self.packet_rate, 100, 20000, resolution=100)
+        self.add_slider('Subnets in Flight:', self.subnet_width, 1, 64)
+        self.log(BANNER)
+        self.log(f"⏱ Ready in {(time.perf_counter() - STARTED) * 1000:.0f} ms")
+        self.window.after(LOG_FRAME_MS, self.flush_log)
+
+    def add_slider(self, label, variable, lo, hi, resolution=1):
+        frame = tk.Frame(self.window, bg='#1e1e1e')
+        frame.pack(pady=0)
+        tk.Label(frame, text=label, bg='#1e1e1e', fg='#0f0').pack(side='left', padx=5)
+        slider = tk.Scale(frame, from_=lo, to=hi, resolution=resolution, orient='horizontal', variable=variable,
+                          bg='#222', fg='#0f0', troughcolor='#333', highlightthickness=0, length=200)
+        slider.pack(side='left')
+
+    # --- GUI Logging ---
+    def log(self, msg, tag=None):
+        self.sink.write(msg, tag)
+
+    def flush_log(self):
+        """Moves one frame's worth of queued lines into the widget and trims scrollback."""
+        try:
+            batch, dropped = self.sink.drain(LOG_BATCH_LINES)
+            if dropped:
+                batch.insert(0, (f"… {dropped} log line(s) dropped under load", None))
+            if batch:
+                output = self.output
+                # one insert per run of equally-tagged lines
+                run_text, run_tag = [], batch[0][1]
+                for msg, tag in batch:
+                    if tag != run_tag:
+                        output.insert(tk.END, '\n'.join(run_text) + '\n', run_tag)
+                        run_text, run_tag = [], tag
+                    run_text.append(msg)
+                output.insert(tk.END, '\n'.join(run_text) + '\n', run_tag)
+                excess = int(output.index('end-1c').split('.')[0]) - self.scrollback
+                if excess > 0:
+                    output.delete('1.0', f'{excess + 1}.0')
+                output.see(tk.END)
+        finally:
+            self.window.after(LOG_FRAME_MS, self.flush_log)
+
+    def clear_log(self):
+        if self.output:
+            self.output.delete('1.0', tk.END)
+
+    # --- Controls ---
+    def config(self):
+        profile_dir = f"LANLord_profile_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}" if self.is_profiling else None
+        return ScanConfig(deep=self.is_deep_scan, packet_rate=self.packet_rate.get(), auto_rate=self.is_auto_rate,
+                          connect_limit=self.connect_limit.get(), subnet_width=self.subnet_width.get(),
+                          keep_hosts=False, incremental=self.is_incremental, profile_dir=profile_dir)
+
+    def start_scan(self, mode, target=None):
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.results_path = f"LANLord_scan_{timestamp}.jsonl"
+        writer = self.writer = ResultWriter(self.results_path)
+        inventory = Inventory(INVENTORY_PATH, log=self.log)
+        scanner = self.scanner = Scanner(self.config(), log=self.log, on_host=writer.write, inventory=inventory)
+        self.log(f"💾 Streaming results to {self.results_path} and {INVENTORY_PATH}")
+        threading.Thread(target=self._run_scan, args=(scanner, writer, inventory, mode, target), daemon=True).start()
+
+    def _run_scan(self, scanner, writer, inventory, mode, target):
+        try:
+            scanner.run(mode, target)
+        except ValueError as e:
+            self.window.after(0, messagebox.showerror, "Input Error", str(e))
+        except MissingDependency as e:
+            self.log(f"⚠️ {e}")
+        except Exception as e:
+            self.log(f"⚠️ Scan failed: {e!r}")
+        finally:
+            writer.close()
+            inventory.close()
+            metrics_path = writer.path.replace('_scan_', '_metrics_').rsplit('.', 1)[0] + '.json'
+            try:
+                with open(metrics_path, 'w') as f:
+                    json.dump(scanner.metrics.snapshot(), f, indent=1)
+                self.log(f"📊 Metrics saved to {metrics_path}")
+            except OSError as e:
+                self.log(f"⚠️ Could not save metrics: {e}")
+
+    def show_metrics(self):
+        """Opens (or raises) a window showing the running scan's metrics, refreshed every second."""
+        if self.metrics_window and self.metrics_window.winfo_exists():
+            self.metrics_window.lift()
+            return
+        top = self.metrics_window = tk.Toplevel(self.window)
+        top.title('LANLord metrics')
+        top.configure(bg='#1e1e1e')
+        text = tk.Text(top, bg='#111', fg='#0f0', font=('Courier', 10), width=98, height=14)
+        text.pack(fill='both', expand=True, padx=10, pady=10)
+
+        def refresh():
+            if not top.winfo_exists():
+                return
+            text.delete('1.0', tk.END)
+            text.insert(tk.END, self.scanner.metrics.table() if self.scanner else "No scan yet.")
+            top.after(1000, refresh)
+
+        refresh()
+
+    def start_ping(self, host):
+        self.ping_stop = threading.Event()
+        threading.Thread(target=ping_test, args=(host, self.ping_stop, self.log), daemon=True).start()
+
+    def toggle_deep(self):
+        self.is_deep_scan = not self.is_deep_scan
+        self.btn_deep.config(relief=tk.SUNKEN if self.is_deep_scan else tk.RAISED)
+        self.log(f"⚙ Deep Scan {'ON' if self.is_deep_scan else 'OFF'}")
+
+    def toggle_incremental(self):
+        self.is_incremental = not self.is_incremental
+        self.btn_incremental.config(relief=tk.SUNKEN if self.is_incremental else tk.RAISED)
+        self.log(f"⚙ Incremental Deep Scan {'ON' if self.is_incremental else 'OFF'} (re-enrich only new, changed or stale hosts)")
+
+    def toggle_profile(self):
+        self.is_profiling = not self.is_profiling
+        self.btn_profile.config(relief=tk.SUNKEN if self.is_profiling else tk.RAISED)
+        self.log(f"⚙ Profiling {'ON' if self.is_profiling else 'OFF'} (pstats per phase from the next scan)")
+
+    def toggle_auto_rate(self):
+        self.is_auto_rate = not self.is_auto_rate
+        self.btn_auto_rate.config(relief=tk.SUNKEN if self.is_auto_rate else tk.RAISED)
+        self.log(f"⚙ Auto Rate {'ON' if self.is_auto_rate else 'OFF'} (Max Packets/s is where the next scan starts)")
+
+    def stop(self):
+        if self.scanner:
+            self.scanner.stop()
+        self.ping_stop.set()
+        self.log("⛔ Operation stopped")
+
+    def export(self):
+        if self.writer:
+            # make sure everything found so far is on disk before rendering
+            self.writer.sync()
+            threading.Thread(target=self._export, args=(self.scanner.profiler,), daemon=True).start()
+        else:
+            self.log("⚠️ Nothing to export.")
+
+    def _export(self, profiler):
+        with profiler.phase('export'):
+            export_loot(self.results_path, None, self.log)
+        if profiler:
+            profiler.dump(self.log)
+
+    def mainloop(self):
+        self.window.mainloop()
+
+# --- CLI ---
+def add_probe_options(parser):
+    """Options shared by scan and coordinator: what to probe and how hard."""
+    parser.add_argument('--deep', action='store_true', help='ICMP sweep, SNMP and port scan every subnet')
+    parser.add_argument('--rate', type=int, default=ScanConfig.packet_rate, help='global packets/s budget (0 = unlimited)')
+    parser.add_argument('--auto-rate', action='store_true',
+                        help='start at --rate and tune it: back off on loss or kernel drops, speed up while clean')
+    parser.add_argument('--rate-ceiling', type=int, default=ScanConfig.rate_ceiling, help='highest packets/s --auto-rate may reach')
+    parser.add_argument('--connects', type=int, default=ScanConfig.connect_limit, help='max TCP connects in flight')
+    parser.add_argument('--width', type=int, default=ScanConfig.subnet_width, help='subnets worked concurrently')
+    parser.add_argument('--fixed-timeouts', action='store_true', help='use the default timeouts instead of measured RTTs')
+    parser.add_argument('--community', default=ScanConfig.snmp_community, help='SNMP v2c community for deep scans')
+    parser.add_argument('-p', '--ports', default=ScanConfig.ports,
+                        help=f"ports for deep scans: topN, a-b ranges, lists or profiles ({', '.join(PORT_PROFILES)})")
+
+def add_output_options(parser):
+    parser.add_argument('-o', '--out', help='also append hosts to this file as they finish (.csv for CSV, JSONL otherwise)')
+    parser.add_argument('--fsync', type=float, default=5.0, help='seconds between fsyncs of --out')
+    parser.add_argument('--db', help='record hosts and ports in this SQLite inventory')
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='LANLord', description='RFC1918 Mapper & Scanner. Starts the GUI when run without a command.')
+    parser.add_argument('--install-deps', action='store_true', help='pip install missing scapy/pysnmp before starting')
+    parser.add_argument('--import-times', action='store_true', help='print the cost of every lazy import to stderr on exit')
+    parser.add_argument('--scrollback', type=int, default=5000, help='lines kept in the GUI log')
+    sub = parser.add_subparsers(dest='command')
+    scan = sub.add_parser('scan', help='run a scan headless and stream hosts to stdout as JSON lines')
+    scan.add_argument('target', help="'sweep', 'quick', or an IP, CIDR or start-end range of /24s")
+    add_probe_options(scan)
+    scan.add_argument('--shards', type=int, default=1,
+                      help='split the targets across this many worker processes, 0 = one per core (default: 1)')
+    scan.add_argument('--shard', type=parse_shard, help=argparse.SUPPRESS)
+    add_output_options(scan)
+    scan.add_argument('--incremental', action='store_true',
+                      help='with --deep and --db: only re-enrich hosts that are new, changed or stale')
+    scan.add_argument('--stale', type=parse_age, default=ScanConfig.stale_after,
+                      help="re-enrich unchanged hosts after this age (default 24h)")
+    scan.add_argument('--metrics', help='write the final scan metrics to this JSON file')
+    scan.add_argument('--metrics-port', type=int, help='serve live metrics in Prometheus format on this port')
+    scan.add_argument('--metrics-bind', default='127.0.0.1', help='address for --metrics-port (default: 127.0.0.1)')
+    scan.add_argument('--profile', metavar='DIR', help='cProfile each scan phase into DIR (pstats files and summary.txt)')
+    scan.add_argument('--profile-top', type=int, default=ScanConfig.profile_top, help='functions per phase in the summary')
+    scan.add_argument('-v', '--verbose', action='store_true', help='log progress to stderr')
+    query = sub.add_parser('query', help='print hosts from the SQLite inventory as JSON lines')
+    query.add_argument('--db', default=INVENTORY_PATH, help=f'inventory file (default: {INVENTORY_PATH})')
+    query.add_argument('--port', type=int, help='only hosts with this TCP port open at their last deep scan')
+    query.add_argument('--cidr', help='only hosts inside this network')
+    query.add_argument('--since', type=parse_age, help="only hosts seen within this age, e.g. '12h' or '7d'")
+    render = sub.add_parser('render', help='render a JSONL/CSV results file as a Markdown report')
+    render.add_argument('results', help='results file written by a scan')
+    render.add_argument('-o', '--out', help='Markdown file to write (default: LANLord_loot_<timestamp>.md)')
+    render.add_argument('--profile', metavar='DIR', help='cProfile the export into DIR')
+    coord = sub.add_parser('coordinator', help='hand a target out to worker agents as leased units, merge their hosts')
+    coord.add_argument('target', help="'sweep', 'quick', or an IP, CIDR or start-end range of /24s")
+    coord.add_argument('--bind', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    coord.add_argument('--port', type=int, default=COORDINATOR_PORT, help=f'port to listen on (default: {COORDINATOR_PORT})')
+    coord.add_argument('--unit-blocks', type=int, default=256, help='/24s per work unit (default: 256, a /16)')
+    coord.add_argument('--lease', type=float, default=LEASE_SECONDS, help='seconds of silence before a unit is re-leased')
+    coord.add_argument('--secret', default=os.environ.get('LANLORD_SECRET'), help='shared secret workers must present (default: $LANLORD_SECRET)')
+    add_probe_options(coord)
+    add_output_options(coord)
+    coord.add_argument('-v', '--verbose', action='store_true', help='log leases and progress to stderr')
+    worker = sub.add_parser('worker', help='scan units leased from a coordinator')
+    worker.add_argument('coordinator', nargs='?', default=f'127.0.0.1:{COORDINATOR_PORT}', help='HOST:PORT of the coordinator')
+    worker.add_argument('--name', help='name shown by the coordinator (default: hostname-pid)')
+    worker.add_argument('--secret', default=os.environ.get('LANLORD_SECRET'), help='shared secret (default: $LANLORD_SECRET)')
+    worker.add_argument('--patience', type=float, default=30.0, help='seconds to keep retrying the first connect')
+    worker.add_argument('-v', '--verbose', action='store_true', help='log scan progress to stderr as well')
+    footprint = sub.add_parser('footprint', help='measure memory per stored host')
+    footprint.add_argument('-n', '--hosts', type=int, default=100000, help='hosts to build (default: 100000)')
+    return parser
+
+def parse_shard(text):
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, got {text!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard {text} out of range")
+    return index, count
+
+def shard_command(args, index, count):
+    """The headless scan command for one shard, with its share of the rate and connect limits."""
+    cmd = [sys.executable, os.path.abspath(__file__), 'scan', args.target, '--shard', f"{index}/{count}",
+           '--rate', str(max(1, args.rate // count) if args.rate else 0),
+           '--connects', str(max(1, args.connects // count)), '--width', str(args.width),
+           '--community', args.community, '-p', args.ports]
+    if args.deep:
+        cmd.append('--deep')
+    if args.fixed_timeouts:
+        cmd.append('--fixed-timeouts')
+    if args.auto_rate:
+        cmd += ['--auto-rate', '--rate-ceiling', str(max(1, args.rate_ceiling // count))]
+    if args.verbose:
+        cmd.append('-v')
+    if args.profile:
+        cmd += ['--profile', os.path.join(args.profile, f"shard{index}"), '--profile-top', str(args.profile_top)]
+    if args.metrics:
+        root, ext = os.path.splitext(args.metrics)
+        cmd += ['--metrics', f"{root}.shard{index}{ext or '.json'}"]
+    if args.metrics_port is not None:
+        cmd += ['--metrics-port', str(args.metrics_port + index if args.metrics_port else 0),
+                '--metrics-bind', args.metrics_bind]
+    return cmd
+
+def stderr_logger(prefix=''):
+    def log(msg, tag=None):
+        # one write per line so messages from concurrent stages (and processes) don't interleave
+        sys.stderr.write(f"{prefix}{msg}\n")
+        sys.stderr.flush()
+    return log
+
+def scan_mode(target):
+    """Scanner.run() arguments for a CLI target."""
+    return (target, None) if target in ('sweep', 'quick') else ('manual', target)
+
+class MergedOutput:
+    """
+    Where hosts from other processes or machines end up: each JSON line
+    goes to stdout and, rebuilt as a HostRecord, to --out and --db.
+    """
+    def __init__(self, args, result):
+        self.result = result
+        self.deep = args.deep
+        self.writer = ResultWriter(args.out, fsync_interval=args.fsync) if args.out else None
+        self.inventory = Inventory(args.db, log=stderr_logger()) if args.db else None
+
+    def emit(self, line):
+        sys.stdout.write(line)
+        self.result.count += 1
+        if self.writer or self.inventory:
+            host = HostRecord.from_dict(json.loads(line))
+            if self.writer:
+                self.writer.write(host)
+            if self.inventory:
+                self.inventory.record(host, enriched=self.deep)
+
+    def close(self):
+        sys.stdout.flush()
+        self.result.finished = datetime.now()
+        if self.writer:
+            self.writer.close()
+        if self.inventory:
+            self.inventory.record_scan(self.result, self.deep)
+            self.inventory.close()
+
+def run_sharded(args, count):
+    """
+    Runs count headless scans in worker processes, each on its own contiguous
+    part of the targets, and merges their JSON lines into one stream in
+    shard order: the lowest unfinished shard streams straight through while
+    later ones spool to temporary files until it is done. --out and --db
+    are written here, once, from the merged stream.
+    """
+    if args.incremental:
+        print("LANLord: --incremental cannot be combined with --shards", file=sys.stderr)
+        return 2
+    try:
+        # no point in more workers than there are /24s to hand out
+        count = max(1, min(count, TargetSpec.parse(args.target).block_count()))
+    except ValueError as e:
+        print(f"LANLord: {e}", file=sys.stderr)
+        return 2
+    result = ScanResult(*scan_mode(args.target))
+    output = MergedOutput(args, result)
+    emit = output.emit
+    lock = threading.Lock()
+    spools = [tempfile.TemporaryFile('w+', encoding='utf-8') for _ in range(count)]
+    done = [False] * count
+    current = 0
+
+    def advance():
+        nonlocal current
+        while current < count and done[current]:
+            current += 1
+            if current < count:
+                spools[current].seek(0)
+                for line in spools[current]:
+                    emit(line)
+                spools[current].seek(0)
+                spools[current].truncate()
+        sys.stdout.flush()
+
+    def pump(index, proc):
+        for line in proc.stdout:
+            with lock:
+                if index == current:
+                    emit(line)
+                    sys.stdout.flush()
+                else:
+                    spools[index].write(line)
+        proc.wait()
+        with lock:
+            done[index] = True
+            advance()
+
+    if args.verbose:
+        print(f"🧩 Splitting {args.target} across {count} worker process(es)", file=sys.stderr)
+    procs = [subprocess.Popen(shard_command(args, i, count), stdout=subprocess.PIPE, text=True, encoding='utf-8')
+             for i in range(count)]
+    pumps = [threading.Thread(target=pump, args=(i, proc), daemon=True) for i, proc in enumerate(procs)]
+    for t in pumps:
+        t.start()
+
+    def stop(*_):
+        result.stopped = True
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while any(t.is_alive() for t in pumps):
+            for t in pumps:
+                t.join(0.5)
+    except KeyboardInterrupt:
+        stop()
+        for t in pumps:
+            t.join()
+    finally:
+        for spool in spools:
+            spool.close()
+        output.close()
+    codes = [proc.returncode for proc in procs]
+    if args.verbose:
+        print(json.dumps(result.summary()), file=sys.stderr)
+    failed = [code for code in codes if code not in (0, 130)]
+    if failed:
+        return failed[0]
+    return 130 if result.stopped or 130 in codes else 0
+
+def run_coordinator(args):
+    try:
+        blocks = TargetSpec.parse(args.target).block_count()
+    except ValueError as e:
+        print(f"LANLord: {e}", file=sys.stderr)
+        return 2
+    config = {'deep': args.deep, 'packet_rate': args.rate, 'auto_rate': args.auto_rate, 'rate_ceiling': args.rate_ceiling,
+              'connect_limit': args.connects, 'subnet_width': args.width, 'ports': args.ports, 'snmp_community': args.community, 'adaptive_timeouts': not args.fixed_timeouts}
+    try:
+        parse_ports(args.ports)
+    except ValueError as e:
+        print(f"LANLord: {e}", file=sys.stderr)
+        return 2
+    result = ScanResult(*scan_mode(args.target))
+    output = MergedOutput(args, result)
+    coordinator = Coordinator(args.target, max(1, -(-blocks // max(1, args.unit_blocks))), config, lease=args.lease,
+                              secret=args.secret, on_line=output.emit, log=stderr_logger() if args.verbose else _no_log)
+    signal.signal(signal.SIGTERM, lambda *_: coordinator.stop())
+    try:
+        completed, units = coordinator.serve(args.bind, args.port)
+    except KeyboardInterrupt:
+        completed, units = coordinator.reported, len(coordinator.units)
+    except OSError as e:
+        print(f"LANLord: cannot listen on {args.bind}:{args.port}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        output.close()
+    result.stopped = completed < units
+    if args.verbose:
+        print(json.dumps(dict(result.summary(), units=units, completed=completed)), file=sys.stderr)
+    return 130 if result.stopped else 0
+
+def run_worker(args):
+    host, _, port = args.coordinator.rpartition(':')
+    try:
+        address = (host or '127.0.0.1', int(port))
+    except ValueError:
+        print(f"LANLord: expected HOST:PORT, got {args.coordinator!r}", file=sys.stderr)
+        return 2
+    agent = WorkerAgent(address, name=args.name, secret=args.secret, patience=args.patience, log=stderr_logger(),
+                        scan_log=stderr_logger('   ') if args.verbose else None)
+    signal.signal(signal.SIGTERM, lambda *_: agent.stop())
+    try:
+        completed = agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+        return 130
+    except (OSError, ValueError) as e:
+        print(f"LANLord: worker stopped: {e}", file=sys.stderr)
+        return 1
+    print(f"🏁 {completed} unit(s) completed", file=sys.stderr)
+    return 0
+
+def run_headless(args):
+    if args.incremental and not args.db:
+        print("LANLord: --incremental needs an inventory (--db)", file=sys.stderr)
+        return 2
+    shards = args.shards if args.shards > 0 else os.cpu_count() or 1
+    if shards > 1 and not args.shard:
+        return run_sharded(args, shards)
+    out_lock = threading.Lock()
+    writer = ResultWriter(args.out, fsync_interval=args.fsync) if args.out else None
+    inventory = Inventory(args.db, log=stderr_logger()) if args.db else None
+
+    def emit(host):
+        if writer:
+            writer.write(host)
+        with out_lock:
+            sys.stdout.write(json.dumps(host.to_dict()) + '\n')
+            sys.stdout.flush()
+
+    log_stderr = stderr_logger(f"[{args.shard[0]}/{args.shard[1]}] " if args.shard else '')
+
+    mode, target = scan_mode(args.target)
+    config = ScanConfig(deep=args.deep, packet_rate=args.rate, auto_rate=args.auto_rate, rate_ceiling=args.rate_ceiling,
+                        connect_limit=args.connects, subnet_width=args.width, keep_hosts=False, incremental=args.incremental, stale_after=args.stale,
+                        snmp_community=args.community, adaptive_timeouts=not args.fixed_timeouts, ports=args.ports,
+                        profile_dir=args.profile, profile_top=args.profile_top,
+                        shard=args.shard[0] if args.shard else 0, shards=args.shard[1] if args.shard else 1)
+    scanner = Scanner(config, log=log_stderr if args.verbose else None, on_host=emit, inventory=inventory)
+    signal.signal(signal.SIGTERM, lambda *_: scanner.stop())
+    server = None
+    if args.metrics_port is not None:
+        try:
+            server = serve_metrics(scanner.metrics, args.metrics_port, args.metrics_bind)
+        except OSError as e:
+            print(f"LANLord: cannot serve metrics on {args.metrics_bind}:{args.metrics_port}: {e}", file=sys.stderr)
+            return 1
+        if args.verbose:
+            log_stderr(f"📊 Metrics at http://{args.metrics_bind}:{server.server_address[1]}/metrics")
+    outcome = {}
+
+    def work():
+        try:
+            outcome['result'] = scanner.run(mode, target)
+        except Exception as e:
+            outcome['error'] = e
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        scanner.stop()
+        worker.join()
+    finally:
+        if writer:
+            writer.close()
+        if inventory:
+            inventory.close()
+        if server:
+            server.shutdown()
+        if args.metrics:
+            with open(args.metrics, 'w') as f:
+                json.dump(scanner.metrics.snapshot(), f, indent=1)
+    error = outcome.get('error')
+    if isinstance(error, (ValueError, MissingDependency)):
+        print(f"LANLord: {error}", file=sys.stderr)
+        return 2 if isinstance(error, ValueError) else 1
+    if error is not None:
+        print(f"LANLord: scan failed: {error!r}", file=sys.stderr)
+        return 1
+    if args.verbose:
+        log_stderr(scanner.metrics.table())
+        log_stderr(json.dumps(outcome['result'].summary()))
+    return 130 if scanner.stopped else 0
+
+def report_import_times(ready):
+    print(f"⏱ {'startup (until ready)':<30} {ready * 1000:8.1f} ms", file=sys.stderr)
+    for name, seconds in sorted(IMPORT_TIMES.items(), key=lambda kv: -kv[1]):
+        print(f"⏱ {name:<30} {seconds * 1000:8.1f} ms", file=sys.stderr)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ready = time.perf_counter() - STARTED
+    if args.install_deps:
+        install_dependencies(lambda msg, tag=None: print(msg, file=sys.stderr))
+    try:
+        if args.command == 'scan':
+            return run_headless(args)
+        if args.command == 'coordinator':
+            return run_coordinator(args)
+        if args.command == 'worker':
+            return run_worker(args)
+        if args.command == 'query':
+            if not os.path.exists(args.db):
+                print(f"LANLord: no inventory at {args.db}", file=sys.stderr)
+                return 1
+            for host in Inventory(args.db).query(args.port, args.cidr, args.since):
+                print(json.dumps(host))
+            return 0
+        if args.command == 'render':
+            log = lambda msg, tag=None: print(msg, file=sys.stderr)
+            profiler = PhaseProfiler(args.profile)
+            with profiler.phase('export'):
+                path = export_loot(args.results, args.out, log)
+            if profiler:
+                profiler.dump(log)
+            return 0 if path else 1
+        if args.command == 'footprint':
+            record, plain = host_footprint(args.hosts)
+            print(f"HostRecord: {record:.0f} bytes/host, dict: {plain:.0f} bytes/host "
+                  f"({args.hosts} hosts, {args.hosts * record / 2 ** 20:.1f} MiB vs {args.hosts * plain / 2 ** 20:.1f} MiB)")
+            return 0
+        if tk is None:
+            print("LANLord: Tk is not available; use the 'scan' command for headless runs", file=sys.stderr)
+            return 1
+        LANLordGUI(scrollback=args.scrollback).mainloop()
+        return 0
+    finally:
+        if args.import_times:
+            report_import_times(ready)
+
+if __name__ == '__main__':
+    sys.exit(main())